@@ -0,0 +1,14 @@
+"""Pearson and Spearman correlation matrices of every numeric column, overall and by sex, smoker and month."""
+from src.specs import CorrelationMatrix
+
+SPEC = CorrelationMatrix("Correlation_Matrix", strata=("sex", "smoker", "month"))
+
+
+def run(df, out_dir, show=False, open_after=False, **kwargs):
+    from src.executor import run_correlation_matrix   # the engine (pandas, matplotlib) loads only when the step runs
+    return run_correlation_matrix(SPEC, df, out_dir, show=show, open_after=open_after, **kwargs)
+
+
+if __name__ == "__main__":
+    from src.executor import standalone
+    standalone(SPEC)
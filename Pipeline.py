@@ -1,49 +1,397 @@
 # Pipeline.py
 from pathlib import Path
 import argparse                       # command-line argument parsing
-import pandas as pd                   # data loading/manipulation
-import matplotlib.pyplot as plt       # plotting (some steps may open figures)
+import atexit
+import importlib
+import sys
+# Only light modules at import time: argument errors, --list-steps and up-to-date runs never load
+# pandas or matplotlib. The engine is imported inside the functions that run steps.
+from src.options import CI_METHODS, CI_DEFAULT, RENDERERS, parse_bins, parse_export   # CI modes, renderers, bins, export formats
+from src.utils import DATA, load_dataset, resolve_data_path   # shared, memoized dataset loader (pandas loads on first use)
+from src.manifest import Manifest, step_record   # incremental runs: skip up-to-date steps
+from src.hashing import dataset_hash
+from src import profiling              # --profile: per-step/per-chart timings and a trace file
+from src.profiling import span
 
-# Import step modules (each exposes a `run(df, out_dir, show=...)` function)
-import  Correlation_Stress, Correlation_Sleep, Correlation_Alcohol, Correlation_Smoking, Basic_PhysiologicalConnections
-
-# Registry of pipeline steps: keys are CLI names, values are callables to execute
+# Registry of pipeline steps: CLI name -> "module:attribute" of the step's spec. A step module is
+# imported only when its step is selected (or listed)
 STEPS = {
-    "Correlation_Stress": Correlation_Stress.run,
-    "Correlation_Sleep": Correlation_Sleep.run,
-    "Correlation_Alcohol": Correlation_Alcohol.run,
-    "Correlation_Smoking": Correlation_Smoking.run,
-    "Basic_PhysiologicalConnections": Basic_PhysiologicalConnections.run
-
+    "Correlation_Stress": "Correlation_Stress:SPEC",
+    "Correlation_Sleep": "Correlation_Sleep:SPEC",
+    "Correlation_Alcohol": "Correlation_Alcohol:SPEC",
+    "Correlation_Smoking": "Correlation_Smoking:SPEC",
+    "Basic_PhysiologicalConnections": "Basic_PhysiologicalConnections:SPEC",
+    "Correlation_Matrix": "Correlation_Matrix:SPEC",
+    "Data_Visualization": "Data_Visualization:SPEC",
+    "Subject_Trends": "Subject_Trends:SPEC",
 }
+_RESOLVED = {}   # step name -> spec, filled on first use
+
+
+def spec_of(name):
+    # Import the step's module on first use and return its spec
+    if name not in _RESOLVED:
+        module, attr = STEPS[name].split(":")
+        _RESOLVED[name] = getattr(importlib.import_module(module), attr)
+    return _RESOLVED[name]
+
+
+def __getattr__(name):
+    # Backwards compatible module attributes (`Pipeline.SPECS`, ...), resolved for every step on access
+    if name == "SPECS":
+        return [spec_of(n) for n in STEPS]
+    if name == "SPEC_BY_NAME":
+        return {n: spec_of(n) for n in STEPS}
+    if name == "REQUESTS":
+        return {n: spec_of(n).requests for n in STEPS}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _artifacts(res):
+    # Keep only printable artifact paths
+    if not isinstance(res, dict):
+        return {}
+    return {k: str(v) for k, v in res.items() if v}
+
+
+def _report(name, artifacts=None, error=None):
+    # Uniform per-step status line followed by the artifacts it produced
+    if error is not None:
+        print(f"!!! Failed: {name}: {type(error).__name__}: {error}")
+        return
+    print(f">>> Done: {name}")
+    for k, v in artifacts.items():
+        print(f"    {k}: {v}")
+
+
+def _run_steps(names, df, tables, out_dir, jobs, show, results, charts=None, renderer="seaborn",
+               writers=2, sums=None, **options):
+    """Run steps in order and report each; returns (succeeded, failed) step names.
+
+    Tables are collected in ``results`` and written in bulk once every step ran.
+    ``charts`` optionally maps a step name to the subset of its charts to refresh,
+    ``sums`` a correlation step to the Pearson sums it can use instead of the rows.
+    PNG encoding and table exports run on ``writers`` background threads.
+    """
+    import matplotlib.pyplot as plt   # plotting (some steps may open figures)
+    from src.executor import build_steps   # generic executor for declarative step specs
+    from src.render import RenderQueue   # render workers for --jobs
+    from src.writer import ArtifactWriter   # background, atomic writes of PNGs and tables
+    steps = build_steps(spec_of(name) for name in names)
+    writer = ArtifactWriter(threads=writers)
+    results.writer = writer
+    # jobs == 1 renders inline (the original sequential behaviour); otherwise figures go to a pool
+    render = RenderQueue(jobs=jobs if jobs > 1 else 0, show=show, renderer=renderer, writer=writer)
+    outcome = {}
+    # Execute each selected step in order: tables here, figures on the render queue
+    for name in names:
+        print(f">>> Running: {name}")  # progress log
+        render.owner = writer.owner = name
+        subset = {"charts": charts[name]} if charts is not None else {}
+        if sums and name in sums:
+            subset["sums"] = sums[name]
+        try:
+            with span(name, "step", step=name):
+                outcome[name] = steps[name](df=df, out_dir=out_dir, show=show, render=render, tables=tables,
+                                            results=results, **subset, **options)  # may return dict of artifacts
+        except Exception as e:
+            outcome[name] = e
+        # Close any figures left open by the step (useful when --show is False)
+        plt.close('all')
+
+    # Wait for the render workers, then report per step in the requested order
+    render_errors = {}
+    for owner, _, error in render.close():
+        if error is not None:
+            render_errors.setdefault(owner, error)
+    # Bulk write of the results store; a failure here fails every step
+    try:
+        results.flush()
+        write_error = None
+    except Exception as e:
+        write_error = e
+    # Wait for the background writes; the first error of a step is reported for it
+    for owner, _, error in writer.close():
+        if error is not None:
+            render_errors.setdefault(owner, error)
+    done, failed = [], []
+    for name in names:
+        res = outcome[name]
+        error = res if isinstance(res, Exception) else render_errors.get(name) or write_error
+        if error is not None:
+            failed.append(name)
+            _report(name, error=error)
+        else:
+            done.append(name)
+            _report(name, _artifacts(res))
+    return done, failed
+
+
+def _results(args, out_dir, data_hash=None):
+    # Run-wide results store: optional SQLite file plus the requested file exports
+    from src.store import ResultStore
+    db = None
+    if args.store is not None:
+        db = Path(args.store) if args.store else out_dir / "results.sqlite"
+    return ResultStore(out_dir / "tab", db=db, export=args.export, data_hash=data_hash)
+
+
+def _expected(name, args):
+    # Artifacts a built step leaves behind, given the export formats
+    return [a for a in spec_of(name).artifacts(args.bootstrap) if a.suffix != ".csv" or "csv" in args.export]
+
+
+def _write_profile(profiler, profile_dir):
+    # Runs at exit: profile.json + trace.json and the hottest phases and charts
+    summary_path, trace_path = profiler.write(profile_dir)
+    summary = profiler.summary()
+    run = summary["run"]
+    print(f">>> Profile: {run['wall_s']:.2f} s wall, {run['cpu_s']:.2f} s CPU"
+          + (f", peak RSS {run['peak_rss_mb']:.0f} MB" if run["peak_rss_mb"] is not None else ""))
+    for phase, t in summary["phases"].items():
+        print(f"    {phase:<10} {t['wall_s']:8.3f} s wall {t['cpu_s']:8.3f} s CPU  ({t['spans']} spans)")
+    for c in summary["charts"][:5]:
+        print(f"    hot chart: {c['chart']} {c['total_s']:.3f} s ({c['step']})")
+    print(f"    summary: {summary_path}\n    trace: {trace_path} (chrome://tracing or ui.perfetto.dev)")
+
+
+def _list_steps():
+    # Step name, what it produces and the first line of its module docstring
+    for name, target in STEPS.items():
+        spec = spec_of(name)
+        doc = sys.modules[target.split(":")[0]].__doc__ or ""
+        summary = doc.strip().splitlines()[0] if doc.strip() else ""
+        produces = f"{len(spec.charts)} charts" if spec.charts else "whole-column tables"
+        print(f"{name:<32} {produces:<20} {summary}")
+
+
+def _run_append(args, steps_to_run, out_dir, jobs, ci):
+    """--append: fold one new month into the persisted state and refresh only what changed."""
+    from src.append import AppendState   # --append: incremental monthly updates
+    from src.schema import read_typed
+    all_requests = [r for name in STEPS for r in spec_of(name).requests]
+    summable = [spec_of(name) for name in STEPS if getattr(spec_of(name), "summable", False)]
+    state = AppendState(Path(args.state) if args.state else out_dir / "state")
+    try:
+        if state.exists():
+            state.load(all_requests, summable)
+        else:
+            print(f">>> Initialising aggregate state from {args.data}")
+            state.init(load_dataset(args.data, cache=not args.no_cache), all_requests, summable)
+        rows = read_typed(resolve_data_path(args.append))
+        changed = state.append(rows)
+    except ValueError as e:             # binned charts, a state missing aggregates, a month seen before
+        print(f"!!! Append failed: {e}")
+        return ["append"]
+    state.save()
+    print(f">>> Appended {len(rows)} rows ({', '.join(sorted(rows['month'].astype(str).unique()))}); "
+          f"{len(changed)} tables changed")
+
+    charts = {name: [c for c in spec_of(name).charts if c.request in changed] for name in steps_to_run}
+    # Steps over whole columns or per-subject histories change with every new month: Pearson-only
+    # correlations rerun from their sums, the others on the rows of all ingested months
+    whole = [name for name in steps_to_run if not spec_of(name).charts]
+    names = [name for name in steps_to_run if charts[name] or name in whole]
+    for name in steps_to_run:
+        if name not in names:
+            print(f">>> Unchanged: {name}")
+    if not names:
+        return []
+    if any(name not in state.correlations for name in whole):
+        with span("history", "load"):
+            df = state.history()
+    else:
+        df = None
+    done, failed = _run_steps(names, df, state.tables(), out_dir, jobs, args.show, _results(args, out_dir),
+                              charts=charts, renderer=args.renderer, writers=args.writers, ci=ci,
+                              sums=state.correlations)
+    # These outputs now include appended months, so they no longer match --data alone
+    manifest = Manifest.load(out_dir)
+    for name in done:
+        manifest.forget(name)
+    manifest.save()
+    print(f">>> {len(done)}/{len(names)} steps refreshed")
+    return failed
+
 
 def main():
     p = argparse.ArgumentParser()  # build CLI parser
-    p.add_argument("--data", default="data/set.csv")  # path to the input CSV dataset
+    p.add_argument("--data", default=str(DATA))  # path to the input CSV dataset
     p.add_argument("--out",  default="out")   # base output folder; steps themselves write to out/img and out/tab
     p.add_argument("--steps", default="all")  # "all" or a comma-separated list of step keys e.g. "hrr_age_gender,Avg_BMI_Level"
     p.add_argument("--show", action="store_true",
                    help="show windows SEQUENTIALLY (each step blocks until you close it)")  # translated help text
+    p.add_argument("--jobs", type=int, default=1,
+                   help="number of render worker processes; steps aggregate in this process and "
+                        "queue their figures for headless rendering")
+    p.add_argument("--writers", type=int, default=2,
+                   help="background threads that encode PNGs and write tables while the next "
+                        "chart is computed (0: write synchronously)")
+    p.add_argument("--no-cache", action="store_true",
+                   help="parse the CSV directly instead of using the binary column cache "
+                        "(nothing is written next to the data)")
+    p.add_argument("--rebuild-cache", action="store_true",
+                   help="regenerate the binary column cache for --data before running")
+    p.add_argument("--ci", choices=CI_METHODS, default=CI_DEFAULT["method"],
+                   help="confidence band of regression charts: closed-form OLS (default), "
+                        "seeded bootstrap, or none")
+    p.add_argument("--renderer", choices=RENDERERS, default="seaborn",
+                   help="'template' reuses one figure per chart shape and swaps its data "
+                        "(much faster for many charts); 'seaborn' builds each figure from scratch")
+    p.add_argument("--n-boot", type=int, default=CI_DEFAULT["n_boot"],
+                   help="bootstrap resamples (--ci bootstrap and --bootstrap)")
+    p.add_argument("--seed", type=int, default=CI_DEFAULT["seed"],
+                   help="random seed for --ci bootstrap and --bootstrap")
+    p.add_argument("--bootstrap", action="store_true",
+                   help="also export <table>_boot.csv with batched bootstrap CIs "
+                        "(group means for bar charts, slopes for regressions; uses --n-boot/--seed)")
+    p.add_argument("--bin-x", default="none", metavar="METHOD:N",
+                   help="aggregate regression charts over continuous x per bin instead of per distinct "
+                        "value: width:N (equal-width) or quantile:N (equal-count) bins, or none (default)")
+    p.add_argument("--stream", action="store_true",
+                   help="never hold the whole dataset: read the CSV in chunks and merge per-group partial aggregates "
+                        "(steps that need row data are skipped)")
+    p.add_argument("--chunksize", type=int, default=100_000,
+                   help="rows per chunk with --stream")
+    p.add_argument("--append", metavar="CSV",
+                   help="ingest one new month of rows into the persisted aggregate state and refresh "
+                        "only the tables/charts that changed; steps without charts rerun in full on "
+                        "every ingested month (except Pearson-only correlation matrices), so their cost "
+                        "grows with the history: leave them out with --steps for a quick update")
+    p.add_argument("--state", default=None,
+                   help="aggregate state directory for --append (default: <out>/state)")
+    p.add_argument("--store", nargs="?", const="", default=None, metavar="DB",
+                   help="also write every table into one SQLite results store with run metadata "
+                        "(default path: <out>/results.sqlite)")
+    p.add_argument("--export", default="csv,md",
+                   help="file exports of the tables in out/tab: comma-separated csv,md or 'none'")
+    p.add_argument("--force", action="store_true",
+                   help="rebuild every selected step even if out/manifest.json says it is up to date")
+    p.add_argument("--explain", action="store_true",
+                   help="dry run: print which steps would run and why, then exit")
+    p.add_argument("--list-steps", action="store_true",
+                   help="print the available steps with what they produce, then exit")
+    p.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                   help="time every step and chart by phase (load, aggregate, render, encode, write) and "
+                        "write profile.json and a Chrome trace.json (default dir: <out>/profile)")
+    p.add_argument("--profile-memory", action="store_true",
+                   help="with --profile, also record peak allocations per span with tracemalloc (slower)")
     args = p.parse_args()  # parse arguments from the command line
-
-    df = pd.read_csv(args.data)  # load the dataset once and reuse across steps
-    out_dir = Path(args.out); out_dir.mkdir(parents=True, exist_ok=True)  # ensure base output directory exists
+    if args.list_steps:
+        _list_steps()
+        return
 
     # Resolve which steps to run based on --steps
     steps_to_run = list(STEPS.keys()) if args.steps == "all" \
         else [s.strip() for s in args.steps.split(",") if s.strip()]
+    unknown = [s for s in steps_to_run if s not in STEPS]
+    if unknown:
+        p.error(f"unknown step(s): {', '.join(unknown)}; available: {', '.join(STEPS)}")
+    if args.jobs < 1:
+        p.error("--jobs must be >= 1")
+    if args.writers < 0:
+        p.error("--writers must be >= 0")
+    if args.append and (args.stream or args.bootstrap):
+        p.error("--append cannot be combined with --stream or --bootstrap")
+    if args.stream and args.bootstrap:
+        p.error("--bootstrap resamples raw rows and cannot be combined with --stream")
+    if args.chunksize < 1:
+        p.error("--chunksize must be >= 1")
+    try:
+        args.export = parse_export(args.export)
+    except ValueError as e:
+        p.error(str(e))
+    try:
+        args.bin_x = parse_bins(args.bin_x)
+    except ValueError as e:
+        p.error(str(e))
+    if args.bin_x is not None and args.append:
+        p.error("--bin-x cannot be combined with --append (bins would move as months arrive)")
+    if not args.export and args.store is None:
+        p.error("--export none needs --store, otherwise the tables are not written anywhere")
+    if args.profile_memory and args.profile is None:
+        p.error("--profile-memory needs --profile")
 
-    # Execute each selected step in order
+    if args.bin_x is not None:
+        from src.schema import SCHEMA   # continuous x: the float columns of the dataset
+        continuous = {c for c, dtype in SCHEMA.items() if dtype == "float32"}
+        for name in steps_to_run:
+            if spec_of(name).charts:
+                _RESOLVED[name] = spec_of(name).binned(args.bin_x, continuous)
+
+    out_dir = Path(args.out); out_dir.mkdir(parents=True, exist_ok=True)  # ensure base output directory exists
+    if args.profile is not None and not args.explain:
+        profiler = profiling.enable(memory=args.profile_memory)
+        atexit.register(_write_profile, profiler, Path(args.profile) if args.profile else out_dir / "profile")
+    jobs = args.jobs
+    if args.show and jobs > 1:
+        print("--show needs an interactive session; rendering figures sequentially")
+        jobs = 1
+
+    ci = {**CI_DEFAULT, "method": args.ci, "n_boot": args.n_boot, "seed": args.seed}
+    boot = {"n_boot": args.n_boot, "seed": args.seed, "level": CI_DEFAULT["level"]} \
+        if args.bootstrap else None
+
+    if args.append:
+        if _run_append(args, steps_to_run, out_dir, jobs, ci):
+            sys.exit(1)
+        return
+
+    # Incremental build: compare each step's inputs with what out/manifest.json recorded
+    manifest = Manifest.load(out_dir)
+    data_hash = dataset_hash(resolve_data_path(args.data), save=not args.no_cache)
+    options = {"ci": ci, "bootstrap": boot, "renderer": args.renderer, "export": args.export, "store": args.store}
+    records, pending, unstreamed = {}, [], []
     for name in steps_to_run:
-        print(f">>> Running: {name}")  # progress log
-        res = STEPS[name](df=df, out_dir=out_dir, show=args.show)  # run step; may return dict of artifacts
-        if isinstance(res, dict):
-            # Print returned artifact paths (e.g., figures, images, tables) for quick inspection
-            for k, v in res.items():
-                if v: print(f"    {k}: {v}")
-        # Close any figures left open by the step (useful when --show is False)
-        import matplotlib.pyplot as plt
-        plt.close('all')
+        spec = spec_of(name)        # only the options its kind of step uses: others do not make it stale
+        records[name] = step_record(name, spec, data_hash, {k: options[k] for k in spec.options})
+        reason = "forced" if args.force else \
+            manifest.stale_reason(name, records[name], _expected(name, args))
+        if reason and args.stream and not spec.charts:
+            # Whole-column steps need the rows, which --stream never holds: skipped, not failed
+            unstreamed.append(name)
+            print(f"{name}: skipped (needs row data, not available with --stream)" if args.explain
+                  else f">>> Skipped: {name} (needs row data, not available with --stream)")
+        elif args.explain:
+            print(f"{name}: " + (f"would run ({reason})" if reason else "up to date"))
+        elif reason:
+            pending.append(name)
+        else:
+            print(f">>> Up to date: {name}")
+    if args.explain:
+        return
+    if not pending:
+        print(">>> Nothing to do")
+        return
+    skipped = len(steps_to_run) - len(pending) - len(unstreamed)
+    steps_to_run = pending
+
+    requests = [r for name in steps_to_run for r in spec_of(name).requests]
+    if args.stream:
+        from src.stream import stream_aggregate   # --stream: chunked aggregation with bounded memory
+        # Memory bounded by the number of groups: steps only ever see the aggregated tables
+        df = None
+        with span("stream_aggregate", "load"):
+            tables = stream_aggregate(resolve_data_path(args.data), requests, chunksize=args.chunksize)
+    else:
+        from src.aggregate import aggregate   # one groupby per distinct key set across all steps
+        with span("load_dataset", "load"):
+            df = load_dataset(args.data, cache=not args.no_cache, rebuild=args.rebuild_cache)  # load the dataset once and reuse across steps
+        # Aggregate every (keys, target) pair requested by the selected steps in one pass per key set
+        with span("aggregate", "aggregate"):
+            tables = aggregate(df, requests)
+    done, failed = _run_steps(steps_to_run, df, tables, out_dir, jobs, args.show,
+                              _results(args, out_dir, data_hash), renderer=args.renderer,
+                              writers=args.writers, ci=ci, bootstrap=boot)
+    for name in done:
+        manifest.record(name, records[name], _expected(name, args))
+    manifest.save()
+
+    print(f">>> {len(steps_to_run) - len(failed)}/{len(steps_to_run)} steps succeeded"
+          + (f", {skipped} up to date" if skipped else "")
+          + (f", {len(unstreamed)} skipped (need row data)" if unstreamed else ""))
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":  # script entry point
     main()
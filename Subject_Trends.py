@@ -0,0 +1,14 @@
+"""Month-over-month change of every subject: deltas, slopes, rolling means, best and worst months, by sex and smoker."""
+from src.specs import Trends
+
+SPEC = Trends("Subject_Trends")
+
+
+def run(df, out_dir, show=False, open_after=False, **kwargs):
+    from src.executor import run_trends   # the engine (pandas, numpy) loads only when the step runs
+    return run_trends(SPEC, df, out_dir, show=show, open_after=open_after, **kwargs)
+
+
+if __name__ == "__main__":
+    from src.executor import standalone
+    standalone(SPEC)
@@ -0,0 +1,212 @@
+"""Benchmark suite: load, aggregation, rendering and export at several data scales.
+
+    python benchmarks/run.py                          # 12k rows (data/set.csv)
+    python benchmarks/run.py --scales 12k,1m,10m --repeat 3
+    python benchmarks/run.py --only aggregate --threshold 0.15
+
+Every benchmark is timed ``--repeat`` times and the best time is kept (as
+asv does). Scaled-up inputs are built once under benchmarks/.data by tiling
+data/set.csv with fresh subject ids. Each run is appended to
+benchmarks/history.jsonl together with the commit and machine; a benchmark
+that is slower than the median of the previous ``--window`` runs on the same
+machine by more than ``--threshold`` is a regression and makes the run exit 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import matplotlib
+matplotlib.use("Agg")                  # headless: rendering is timed, never shown
+
+import pandas as pd
+
+import Pipeline
+from src.aggregate import aggregate
+from src.correlation import correlation_table, numeric_columns
+from src.distributions import distribution_tables
+from src.panel import Panel
+from src.render import chart_job, render_chart, CI_DEFAULT, RENDERERS
+from src.schema import read_typed
+from src.specs import CorrelationMatrix, Distributions, Trends
+from src.trends import trend_tables
+from src.utils import DATA, load_dataset, write_table
+
+BENCH_DIR = Path(__file__).resolve().parent
+DATA_DIR = BENCH_DIR / ".data"
+HISTORY = BENCH_DIR / "history.jsonl"
+SCALES = {"12k": None, "1m": 1_000_000, "10m": 10_000_000}   # None: the dataset itself
+GROUPS = ("load", "aggregate", "render", "export")
+
+
+def scaled_dataset(rows: int, chunk_rows: int = 500_000) -> Path:
+    """data/set.csv tiled to ``rows`` rows with fresh subject ids, written once in chunks."""
+    path = DATA_DIR / f"set-{rows}.csv"
+    if path.exists():
+        return path
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    base = pd.read_csv(DATA)
+    span = int(base["id"].max())
+    reps = -(-chunk_rows // len(base))
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", newline="") as fh:
+        written, copy = 0, 0
+        while written < rows:
+            block = pd.concat([base.assign(id=base["id"] + (copy + k) * span) for k in range(reps)],
+                              ignore_index=True)
+            block = block.iloc[:rows - written]
+            block.to_csv(fh, header=written == 0, index=False)
+            written += len(block)
+            copy += reps
+    os.replace(tmp, path)
+    return path
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmarks(path: Path, groups, renderer: str):
+    """Yield (name, callable) pairs; setup (loading, aggregating) happens outside the timed calls."""
+    if "load" in groups:
+        yield "load/read_csv", lambda: pd.read_csv(path)
+        yield "load/read_typed", lambda: read_typed(path)
+        load_dataset(path)             # build the column cache once, then time reads from it
+        yield "load/cached", lambda: _load_from_cache(path)
+    df = load_dataset(path)
+    if "aggregate" in groups:
+        yield "aggregate/panel", lambda: Panel.from_frame(df, static=("sex", "smoker"))
+    specs = Pipeline.SPECS
+    tables = {}
+    for spec in specs:
+        if isinstance(spec, CorrelationMatrix):
+            columns = numeric_columns(df, exclude=spec.exclude)
+            fn = lambda spec=spec, columns=columns: correlation_table(df, columns, spec.methods, spec.strata)
+        elif isinstance(spec, Distributions):
+            columns = numeric_columns(df, exclude=spec.exclude)
+            fn = lambda spec=spec, columns=columns: dict(zip(("hist", "kde"), distribution_tables(
+                df, columns, bins=spec.bins, gridsize=spec.gridsize)))
+        elif isinstance(spec, Trends):
+            fn = lambda spec=spec: dict(zip(("subjects", "cohorts", "monthly"), trend_tables(
+                Panel.from_frame(df, metrics=spec.metrics, static=spec.by), spec.metrics,
+                lower=spec.lower, by=spec.by, window=spec.window)))
+        else:
+            fn = lambda spec=spec: aggregate(df, spec.requests)
+        if "aggregate" in groups:
+            yield f"aggregate/{spec.name}", fn
+        if "render" in groups or "export" in groups:
+            tables[spec.name] = fn()
+    out = DATA_DIR / "out"             # scratch output, overwritten by every run
+    out.mkdir(parents=True, exist_ok=True)
+    if "render" in groups:
+        ci = dict(CI_DEFAULT)
+        for spec in specs:
+            for chart in spec.charts:
+                job = chart_job(chart.kind, tables[spec.name][chart.request], chart.x, chart.y,
+                                chart.palette, chart.figure_title, out / f"{chart.image_stem}.png",
+                                hue=chart.hue, col=chart.col, ci=ci)
+                yield f"render/{chart.image_stem}", lambda job=job: render_chart(job, renderer)
+    if "export" in groups:
+        flat = [t for res in tables.values() for t in (res.values() if isinstance(res, dict) else [res])]
+        for fmt in ("csv", "md"):
+            yield f"export/{fmt}", lambda fmt=fmt: [write_table(t, out, f"t{i}", formats=(fmt,))
+                                                    for i, t in enumerate(flat)]
+
+
+def _load_from_cache(path: Path):
+    # load_dataset memoizes per process; drop the memo so the binary cache itself is timed
+    from src import utils
+    utils._LOADED.clear()
+    return load_dataset(path)
+
+
+def machine() -> str:
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu/py{platform.python_version()}"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history() -> list:
+    if not HISTORY.exists():
+        return []
+    return [json.loads(line) for line in HISTORY.read_text().splitlines() if line.strip()]
+
+
+def regressions(results: dict, history: list, threshold: float, window: int, min_time: float) -> list:
+    # -> [(name, seconds, baseline)] slower than the median of recent runs on this machine
+    out = []
+    for name, seconds in results.items():
+        past = [run["results"][name] for run in history
+                if run["machine"] == machine() and name in run["results"]][-window:]
+        if not past:
+            continue
+        baseline = statistics.median(past)
+        if seconds > min_time and seconds > baseline * (1 + threshold):
+            out.append((name, seconds, baseline))
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description="time load, aggregation, rendering and export")
+    p.add_argument("--scales", default="12k", help=f"comma-separated subset of {', '.join(SCALES)}")
+    p.add_argument("--only", default=",".join(GROUPS), help="benchmark groups to run")
+    p.add_argument("--repeat", type=int, default=3, help="timings per benchmark; the best one is kept")
+    p.add_argument("--renderer", choices=RENDERERS, default="seaborn", help="renderer used by the render benchmarks")
+    p.add_argument("--threshold", type=float, default=0.20,
+                   help="fail when a benchmark is this much slower than its baseline (0.20 = +20%%)")
+    p.add_argument("--window", type=int, default=5, help="previous runs the baseline is the median of")
+    p.add_argument("--min-time", type=float, default=0.005,
+                   help="benchmarks faster than this (seconds) are never flagged: timer noise")
+    p.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    args = p.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    groups = [g.strip() for g in args.only.split(",") if g.strip()]
+    bad = [s for s in scales if s not in SCALES] + [g for g in groups if g not in GROUPS]
+    if bad:
+        p.error(f"unknown scale/group: {', '.join(bad)}")
+
+    results = {}
+    for scale in scales:
+        path = DATA if SCALES[scale] is None else scaled_dataset(SCALES[scale])
+        print(f"== {scale}: {path}")
+        for name, fn in benchmarks(path, groups, args.renderer):
+            key = f"{scale}/{name}"
+            results[key] = timed(fn, args.repeat)
+            print(f"{key:<70} {results[key]:9.4f} s")
+
+    history = load_history()
+    slow = regressions(results, history, args.threshold, args.window, args.min_time)
+    if not args.no_save:
+        with open(HISTORY, "a") as fh:
+            fh.write(json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+                                 "machine": machine(), "repeat": args.repeat, "results": results}) + "\n")
+    for name, seconds, baseline in slow:
+        print(f"!!! Regression: {name}: {seconds:.4f} s vs baseline {baseline:.4f} s "
+              f"(+{(seconds / baseline - 1) * 100:.0f}%)")
+    if slow:
+        sys.exit(1)
+    print(f">>> {len(results)} benchmarks, no regressions above {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
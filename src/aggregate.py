@@ -0,0 +1,46 @@
+"""Shared aggregation engine for (keys) -> summary(target) tables.
+
+Steps declare the aggregates they need as ``(keys, target)`` pairs, e.g.
+``(("stress_level", "sex"), "vo2max")``. ``aggregate`` groups the frame once
+per distinct key set and summarizes every requested target of that key set in
+a single vectorized pass (mean, count, spread, extremes and quartiles; see
+src.summary), so the cost grows with the number of key sets rather than with
+the number of charts. Binned requests ``(keys, target, bins)`` group by the
+bin of the first key instead of its raw values (src.binning).
+"""
+import pandas as pd
+
+from src.binning import bin_edges, collect_binned, is_binned
+from src.schema import DECIMALS, to_float64
+from src.summary import BinnedAggregate, PartialAggregate
+
+
+def collect(requests) -> dict:
+    """Merge requests into {keys: [targets]} preserving first-seen order and dropping duplicates."""
+    plan = {}
+    for keys, target in requests:
+        targets = plan.setdefault(tuple(keys), [])
+        if target not in targets:
+            targets.append(target)
+    return plan
+
+
+def aggregate(df: pd.DataFrame, requests) -> dict:
+    """Return {(keys, target): table} with one table per request.
+
+    Each table has the key columns followed by the mean of the target, the same
+    as ``df.groupby(list(keys))[target].mean().reset_index()``, then the summary
+    columns of src.summary (count, std, var, sem, min, max, q25, q50, q75).
+    Binned requests get per-bin tables (see src.binning), keyed by the request.
+    """
+    aggs = [PartialAggregate(keys, targets)
+            for keys, targets in collect([r for r in requests if not is_binned(r)]).items()]
+    for (keys, bins), targets in collect_binned([r for r in requests if is_binned(r)]).items():
+        edges = bin_edges(bins, to_float64(df[keys[0]]).to_numpy(), DECIMALS.get(keys[0]))
+        aggs.append(BinnedAggregate(keys, targets, bins, edges))
+    tables = {}
+    for agg in aggs:
+        # float64 accumulation with the recorded decimals restored (see src.schema)
+        agg.update(df)
+        tables.update({agg.request(y): table for y, table in agg.tables().items()})
+    return tables
@@ -0,0 +1,162 @@
+"""Persistent aggregate state for incremental monthly appends.
+
+The dataset is an ``id`` x ``month`` panel that grows by one month at a time.
+Instead of recomputing everything, ``AppendState`` keeps (under out/state):
+
+* ``agg-<keys>/``  per key set, the mergeable per-group moments (src.summary)
+* ``sketch-<keys>/<target>/`` the quantile sketch of each target
+* ``corr-<step>.npz`` the Pearson sums of each Pearson-only correlation step
+  (src.correlation), overall and per stratum level
+* ``history/<month>/`` the rows of each ingested month: the other steps over
+  whole columns or per-subject histories (Spearman, histograms, trends) rerun
+  from ``history()``
+* ``state.json``   the months ingested so far
+
+Appending a month reduces only the new rows and folds them into that state;
+``append`` reports which aggregate tables actually changed so only those
+tables and charts need to be refreshed.
+"""
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.aggregate import collect
+from src.binning import is_binned
+from src.cache import read_columns, write_columns
+from src.correlation import correlation_sums, load_sums, merge_sums, numeric_columns, save_sums
+from src.summary import PartialAggregate
+
+STATE_FILE = "state.json"
+
+
+def _tables_equal(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    # Same groups (key columns) and the same statistics up to round-off
+    if a.shape != b.shape or list(a.columns) != list(b.columns):
+        return False
+    values = a.select_dtypes("number").columns.drop(a.columns[0], errors="ignore")
+    keys = [c for c in a.columns if c not in values]
+    if not a[keys].equals(b[keys]):
+        return False
+    return bool(np.allclose(a[values], b[values], rtol=0, atol=1e-12, equal_nan=True))
+
+
+def _check_requests(requests) -> None:
+    # Bins resolved from the data would move as months arrive, so the state keeps plain group means only
+    binned = sorted({f"{keys[0]} ({bins})" for keys, _, bins in filter(is_binned, requests)})
+    if binned:
+        raise ValueError(f"binned charts cannot be updated with --append: {', '.join(binned)}")
+
+
+class AppendState:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.months = []
+        self.partials = {}
+        self.specs = {}             # step name -> Pearson-only CorrelationMatrix spec
+        self.correlations = {}      # step name -> {(stratum, level): CorrelationAccumulator}
+
+    def exists(self) -> bool:
+        return (self.root / STATE_FILE).exists()
+
+    def _agg_dir(self, keys) -> Path:
+        return self.root / ("agg-" + "-".join(keys))
+
+    def _sketch_dir(self, keys, target) -> Path:
+        return self.root / ("sketch-" + "-".join(keys)) / target
+
+    def _corr_path(self, name) -> Path:
+        return self.root / f"corr-{name}.npz"
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def load(self, requests, correlations=()) -> "AppendState":
+        """Read the state of ``requests`` and of the Pearson-only ``correlations`` specs."""
+        _check_requests(requests)
+        meta = json.loads((self.root / STATE_FILE).read_text())
+        self.months = meta["months"]
+        for spec in correlations:
+            # Sums of another spec (strata, excluded columns) cannot be turned into this one's table
+            if meta.get("correlations", {}).get(spec.name) != repr(spec):
+                raise ValueError(f"state in {self.root} has no Pearson sums for {spec.name}; "
+                                 "rebuild it by deleting the directory")
+            self.specs[spec.name] = spec
+            self.correlations[spec.name] = load_sums(self._corr_path(spec.name))
+        for keys, targets in collect(requests).items():
+            agg_dir = self._agg_dir(keys)
+            state = read_columns(agg_dir, mmap=False) if agg_dir.exists() else None
+            sketches = {y: read_columns(self._sketch_dir(keys, y), mmap=False)
+                        for y in targets if self._sketch_dir(keys, y).exists()}
+            agg = PartialAggregate(keys, targets, state, sketches)
+            missing = [y for y in targets
+                       if state is None or f"{y}__m2" not in state or y not in sketches]
+            if missing:
+                raise ValueError(f"state in {self.root} has no aggregates for {keys} -> {missing}; "
+                                 "rebuild it by deleting the directory")
+            self.partials[keys] = agg
+        return self
+
+    def init(self, df: pd.DataFrame, requests, correlations=()) -> "AppendState":
+        """Start the state from a full dataset (all months at once)."""
+        _check_requests(requests)
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        self.root.mkdir(parents=True)
+        self.partials = {keys: PartialAggregate(keys, targets).update(df)
+                         for keys, targets in collect(requests).items()}
+        self.specs = {spec.name: spec for spec in correlations}
+        self.correlations = {spec.name: correlation_sums(df, numeric_columns(df, spec.exclude), spec.strata)
+                             for spec in correlations}
+        self.months = []
+        self._write_history(df)
+        self.save()
+        return self
+
+    def save(self) -> None:
+        for keys, agg in self.partials.items():
+            write_columns(agg.state, self._agg_dir(keys))
+            for y, sketch in agg.sketches.items():
+                write_columns(sketch, self._sketch_dir(keys, y))
+        for name, sums in self.correlations.items():
+            save_sums(sums, self._corr_path(name))
+        meta = {"months": self.months, "correlations": {name: repr(spec) for name, spec in self.specs.items()}}
+        (self.root / STATE_FILE).write_text(json.dumps(meta, indent=1))
+
+    # -- data --------------------------------------------------------------
+
+    def _write_history(self, rows: pd.DataFrame) -> None:
+        for month, block in rows.groupby(rows["month"].astype(str), sort=True):
+            write_columns(block.reset_index(drop=True), self.root / "history" / month)
+            self.months.append(month)
+        self.months.sort()
+
+    def history(self, ids=None) -> pd.DataFrame:
+        """Rows of every ingested month, optionally only for the given subject ids."""
+        parts = []
+        for month in self.months:
+            block = read_columns(self.root / "history" / month)
+            parts.append(block if ids is None else block[block["id"].isin(ids)])
+        return pd.concat(parts, ignore_index=True)
+
+    def tables(self) -> dict:
+        """{(keys, target): table} of group summaries, the same tables as src.aggregate.aggregate."""
+        return {(keys, y): t for keys, agg in self.partials.items() for y, t in agg.tables().items()}
+
+    def append(self, rows: pd.DataFrame) -> set:
+        """Fold new rows into the state; returns the (keys, target) tables whose values changed."""
+        new_months = sorted(rows["month"].astype(str).unique())
+        dup = [m for m in new_months if m in self.months]
+        if dup:
+            raise ValueError(f"month(s) already ingested: {', '.join(dup)}")
+        before = self.tables()
+        for agg in self.partials.values():
+            agg.update(rows)
+        for name, sums in self.correlations.items():
+            spec = self.specs[name]
+            self.correlations[name] = merge_sums(sums, correlation_sums(rows, sums["all", "all"].columns,
+                                                                        spec.strata))
+        self._write_history(rows)
+        after = self.tables()
+        return {k for k, t in after.items() if k not in before or not _tables_equal(before[k], t)}
@@ -0,0 +1,111 @@
+"""Binned aggregation for continuous x columns.
+
+Grouping by the raw values of a measurement such as ``sleep_hours`` or ``bmi``
+gives one group (and one chart point) per distinct value: thousands of
+near-singleton groups whose number grows with the data. A chart with
+``Bins`` (src.specs) groups by the bin of x instead, so its table holds at most
+``bins.n`` rows per hue level at any data volume:
+
+* ``width``     ``n`` equal-width bins between the minimum and maximum of x
+* ``quantile``  ``n`` bins with about the same number of rows (edges at the
+                quantiles of x; tied quantiles merge bins)
+
+Quantile edges come from the log-bucket sketch of src.summary, in memory as in
+``--stream`` (which cannot hold the values), so both give the same bins; they
+are rounded to the recorded decimals of x, the values it can take.
+* ``edges``     the given edges, fixed whatever the data
+
+Bins are closed on the left, except the last one, which also holds its right
+edge (as ``np.histogram``). A binned table has the key columns, with x holding
+the mean x of each (bin, hue) group, the mean of the target, then ``bin``,
+``left``, ``right`` and the summary columns of the target within each group
+(count, std, ... see src.summary).
+"""
+import numpy as np
+import pandas as pd
+
+BIN_COLUMN = "bin"
+
+
+def is_binned(request) -> bool:
+    # (keys, target) or (keys, target, bins)
+    return len(request) == 3
+
+
+def collect_binned(requests) -> dict:
+    """Merge binned requests into {(keys, bins): [targets]}, like ``src.aggregate.collect``."""
+    plan = {}
+    for keys, target, bins in requests:
+        targets = plan.setdefault((tuple(keys), bins), [])
+        if target not in targets:
+            targets.append(target)
+    return plan
+
+
+def quantile_edges(n: int, lo: float, hi: float, buckets, counts, decimals: int = None) -> np.ndarray:
+    """Edges of ``n`` quantile bins of x from its exact min and max and its sketch (``buckets``, ``counts``).
+
+    Inner edges are the sketched quantiles, rounded to ``decimals`` when given;
+    tied edges merge bins.
+    """
+    from src.summary import sketch_quantiles    # src.summary imports this module
+    inner = np.clip(sketch_quantiles(buckets, counts, np.linspace(0, 1, n + 1)[1:-1]), lo, hi)
+    if decimals is not None:
+        inner = np.round(inner, decimals)
+    return np.unique(np.concatenate([[lo], inner, [hi]]))
+
+
+def bin_edges(bins, values, decimals: int = None) -> np.ndarray:
+    """Edges of ``bins`` for the values of x (NaNs ignored); "width" only uses their min and max.
+
+    ``decimals``: recorded precision of x (src.schema), to round quantile edges to.
+    """
+    if bins.method == "edges":
+        edges = np.asarray(bins.edges, dtype="float64")
+        if len(edges) < 2 or np.any(np.diff(edges) <= 0):
+            raise ValueError(f"bin edges must be at least two increasing values, got {bins.edges!r}")
+        return edges
+    if bins.method not in ("width", "quantile"):
+        raise ValueError(f"unknown binning method: {bins.method!r}")
+    if bins.n < 1:
+        raise ValueError(f"the number of bins must be >= 1, got {bins.n}")
+    x = np.asarray(values, dtype="float64")
+    x = x[np.isfinite(x)]
+    if len(x) == 0:
+        return np.array([])
+    lo, hi = x.min(), x.max()
+    if lo == hi:
+        return np.array([lo - .5, hi + .5])      # a constant column: one bin, as np.histogram
+    if bins.method == "width":
+        return np.linspace(lo, hi, bins.n + 1)
+    from src.summary import sketch_buckets
+    return quantile_edges(bins.n, lo, hi, *np.unique(sketch_buckets(x), return_counts=True), decimals)
+
+
+def bin_codes(values, edges) -> np.ndarray:
+    """Bin index of each value as float64; NaN for missing values and values outside the edges."""
+    x = np.asarray(values, dtype="float64")
+    codes = np.full(len(x), np.nan)
+    if len(edges) < 2:
+        return codes
+    idx = np.searchsorted(edges, x, side="right") - 1
+    idx[x == edges[-1]] = len(edges) - 2         # the last bin holds its right edge
+    inside = (idx >= 0) & (idx < len(edges) - 1) & np.isfinite(x)
+    codes[inside] = idx[inside]
+    return codes
+
+
+def binned_table(keys, target, summary: pd.DataFrame, x_mean, edges) -> pd.DataFrame:
+    """Binned table from a per-(bin, other keys) ``summary`` (src.summary) and the mean x of its groups."""
+    codes = summary[BIN_COLUMN].to_numpy().astype("int64")
+    edges = np.asarray(edges, dtype="float64")
+    table = pd.DataFrame({keys[0]: np.asarray(x_mean, dtype="float64")})
+    for k in keys[1:]:
+        table[k] = summary[k].reset_index(drop=True)     # keeps categorical hue levels
+    table[target] = summary[target].to_numpy()
+    table[BIN_COLUMN] = codes
+    table["left"] = edges[codes]
+    table["right"] = edges[codes + 1]
+    for c in summary.columns[len(keys) + 1:]:
+        table[c] = summary[c].to_numpy()                 # count, std, ... (src.summary)
+    return table
@@ -0,0 +1,125 @@
+"""Vectorized bootstrap for group statistics.
+
+Rows are sorted by group once; each resample is an index matrix that, for
+every row slot, picks a random row of the same group. One index matrix is
+shared by all target columns, so many targets are evaluated in the same
+batched NumPy operation, and group sums come out of ``np.add.reduceat`` rather
+than a Python loop. Resamples are processed in blocks sized to keep memory
+bounded, which lets the same code run on millions of rows.
+"""
+import numpy as np
+import pandas as pd
+
+from src.schema import to_float64
+
+MAX_BLOCK_CELLS = 1 << 23     # values materialized per block (~64 MB of float64)
+
+
+def _sorted_groups(frame: pd.DataFrame, keys):
+    # -> (row order, group start offsets, group sizes, key frame of the groups)
+    grouped = frame.groupby(list(keys), observed=True, sort=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy().astype(np.int64)
+    keep = np.flatnonzero(codes >= 0)            # rows with a missing key belong to no group, as in groupby
+    order = keep[np.argsort(codes[keep], kind="stable")]
+    sizes = np.bincount(codes[keep], minlength=grouped.ngroups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    index = grouped.size().index.to_frame(index=False)
+    return order, starts, sizes, index
+
+
+def _index_blocks(starts, sizes, n_boot: int, width: int, seed):
+    """Yield (block, N) resample index matrices, each row a resample within every group."""
+    rng = np.random.default_rng(seed)
+    n = int(sizes.sum())
+    row_start = np.repeat(starts, sizes)
+    row_size = np.repeat(sizes, sizes)
+    dtype = np.int32 if n < 2**31 else np.int64
+    block = max(1, min(n_boot, MAX_BLOCK_CELLS // max(1, n * width)))
+    done = 0
+    while done < n_boot:
+        b = min(block, n_boot - done)
+        u = rng.random((b, n))
+        yield (row_start + (u * row_size).astype(dtype)).astype(dtype, copy=False)
+        done += b
+
+
+def _interval(draws, level):
+    # Percentile interval and standard error across resamples (axis 0), ignoring undefined draws
+    alpha = (100 - level) / 2
+    low, high = np.nanpercentile(draws, [alpha, 100 - alpha], axis=0)
+    return low, high, np.nanstd(draws, axis=0, ddof=1)
+
+
+def _tidy(index, targets, columns: dict) -> pd.DataFrame:
+    # (G, T) arrays -> one row per (group, target)
+    g, t = len(index), len(targets)
+    out = index.loc[np.repeat(np.arange(g), t)].reset_index(drop=True)
+    out["target"] = np.tile(targets, g)
+    for name, values in columns.items():
+        out[name] = np.asarray(values).reshape(g * t)
+    return out
+
+
+def bootstrap_means(df: pd.DataFrame, keys, targets, n_boot: int = 1000,
+                    level: float = 95, seed=0) -> pd.DataFrame:
+    """Bootstrap the mean of every target within every group of ``keys``.
+
+    Returns one row per (group, target) with n, mean, se, ci_low, ci_high.
+    NaNs are excluded per target, as in ``groupby().mean()``.
+    """
+    targets = list(targets)
+    order, starts, sizes, index = _sorted_groups(df, keys)
+    values = np.column_stack([to_float64(df[y]).to_numpy()[order] for y in targets])
+    valid = ~np.isnan(values)
+    values = np.where(valid, values, 0.0)
+    weights = valid.astype("float64")
+
+    def means(idx):
+        sums = np.add.reduceat(values[idx], starts, axis=-2)
+        counts = np.add.reduceat(weights[idx], starts, axis=-2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    point = means(np.arange(len(values)))
+    draws = np.concatenate([means(idx) for idx in
+                            _index_blocks(starts, sizes, n_boot, len(targets), seed)])
+    low, high, se = _interval(draws, level)
+    counts = np.add.reduceat(weights, starts, axis=0)
+    return _tidy(index, targets, {"n": counts.astype("int64"), "mean": point,
+                                  "se": se, "ci_low": low, "ci_high": high})
+
+
+def bootstrap_slopes(df: pd.DataFrame, x: str, targets, by, n_boot: int = 1000,
+                     level: float = 95, seed=0) -> pd.DataFrame:
+    """Bootstrap the OLS slope of every target on ``x`` within every group of ``by``.
+
+    Returns one row per (group, target) with n, slope, se, ci_low, ci_high.
+    Rows where ``x`` or the target is NaN are excluded for that target.
+    """
+    targets = list(targets)
+    order, starts, sizes, index = _sorted_groups(df, by)
+    xv = to_float64(df[x]).to_numpy()[order][:, None]
+    yv = np.column_stack([to_float64(df[y]).to_numpy()[order] for y in targets])
+    valid = ~(np.isnan(xv) | np.isnan(yv))
+    w = valid.astype("float64")
+    xv = np.where(valid, xv, 0.0)
+    yv = np.where(valid, yv, 0.0)
+
+    def slopes(idx):
+        xs, ys, ws = xv[idx], yv[idx], w[idx]
+        n = np.add.reduceat(ws, starts, axis=-2)
+        sx = np.add.reduceat(xs, starts, axis=-2)
+        sy = np.add.reduceat(ys, starts, axis=-2)
+        sxx = np.add.reduceat(xs * xs, starts, axis=-2)
+        sxy = np.add.reduceat(xs * ys, starts, axis=-2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        return np.where(np.isfinite(slope), slope, np.nan)
+
+    point = slopes(np.arange(len(yv)))
+    draws = np.concatenate([slopes(idx) for idx in
+                            _index_blocks(starts, sizes, n_boot, 5 * len(targets), seed)])
+    low, high, se = _interval(draws, level)
+    counts = np.add.reduceat(w, starts, axis=0)
+    return _tidy(index, targets, {"n": counts.astype("int64"), "slope": point,
+                                  "se": se, "ci_low": low, "ci_high": high})
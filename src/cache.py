@@ -0,0 +1,130 @@
+"""Binary columnar cache for CSV datasets.
+
+The first load of a CSV converts it into a directory of ``.npy`` column files
+(memory-mappable, no extra dependency beyond NumPy) plus a ``meta.json`` that
+records how to restore each column's dtype. The directory name carries a
+content hash of the CSV, so editing the file automatically invalidates the
+cache. A small ``index.json`` remembers the hash per (path, mtime, size) so an
+unchanged file is not re-hashed on every run.
+
+Layout, next to the data file::
+
+    data/.cache/index.json
+    data/.cache/set-v<version>-<schema tag>-<hash>/meta.json
+    data/.cache/set-v<version>-<schema tag>-<hash>/NNN.npy   (one file per column)
+"""
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Hashing and the hash index need no NumPy/pandas and live in src.hashing (re-exported here)
+from src.hashing import CACHE_DIRNAME, _write_json, cache_root, content_hash, dataset_hash, is_column_dir
+
+CACHE_VERSION = 1       # bump when the on-disk layout changes
+
+
+def cache_dir(csv_path: Path, digest: str, tag: str = "") -> Path:
+    # `tag` identifies how the frame was parsed (e.g. the schema fingerprint)
+    tag = f"{tag}-" if tag else ""
+    return cache_root(csv_path) / f"{Path(csv_path).stem}-v{CACHE_VERSION}-{tag}{digest}"
+
+
+def _encode_column(s: pd.Series):
+    # -> (array to store, meta describing how to rebuild the pandas column)
+    if isinstance(s.dtype, pd.PeriodDtype):
+        return s.array.asi8, {"kind": "period", "dtype": str(s.dtype)}
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), {"kind": "category",
+                                        "categories": s.cat.categories.tolist(),
+                                        "ordered": bool(s.cat.ordered)}
+    if s.dtype.kind in "biuf":
+        return s.to_numpy(), {"kind": "numeric"}
+    # Strings and other objects are stored dictionary-encoded and restored to their dtype
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    return codes.astype(np.int32), {"kind": "string", "categories": uniques.tolist(),
+                                    "dtype": str(s.dtype)}
+
+
+def _decode_column(arr: np.ndarray, meta: dict) -> pd.Series:
+    kind = meta["kind"]
+    if kind == "numeric":
+        return pd.Series(arr)
+    if kind == "period":
+        return pd.Series(pd.arrays.PeriodArray(np.asarray(arr), dtype=pd.api.types.pandas_dtype(meta["dtype"])))
+    cat = pd.Categorical.from_codes(arr, categories=meta["categories"],
+                                    ordered=meta.get("ordered", False))
+    if kind == "category":
+        return pd.Series(cat)
+    return pd.Series(cat).astype(meta["dtype"])
+
+
+def write_columns(df: pd.DataFrame, target: Path) -> Path:
+    """Write ``df`` as ``.npy`` column files into ``target`` (atomically, via a temp dir)."""
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=target.parent, prefix=".build-"))
+    try:
+        columns = []
+        for i, col in enumerate(df.columns):
+            arr, meta = _encode_column(df[col])
+            fname = f"{i:03d}.npy"           # column names may not be valid file names
+            np.save(tmp / fname, np.ascontiguousarray(arr), allow_pickle=False)
+            columns.append({"name": col, "file": fname, **meta})
+        _write_json(tmp / "meta.json", {"version": CACHE_VERSION, "rows": len(df), "columns": columns})
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return target
+
+
+def read_columns(source: Path, mmap: bool = True) -> pd.DataFrame:
+    """Load a column directory written by ``write_columns``."""
+    source = Path(source)
+    meta = json.loads((source / "meta.json").read_text())
+    data = {}
+    for col in meta["columns"]:
+        arr = np.load(source / col["file"], mmap_mode="r" if mmap else None, allow_pickle=False)
+        data[col["name"]] = _decode_column(arr, col)
+    return pd.DataFrame(data)
+
+
+def iter_columns(source: Path, chunksize: int, usecols=None):
+    """Yield a column directory as DataFrames of ``chunksize`` rows (memory-mapped slices)."""
+    source = Path(source)
+    meta = json.loads((source / "meta.json").read_text())
+    columns = [c for c in meta["columns"] if usecols is None or c["name"] in set(usecols)]
+    arrays = [np.load(source / c["file"], mmap_mode="r", allow_pickle=False) for c in columns]
+    for start in range(0, meta["rows"], chunksize):
+        yield pd.DataFrame({c["name"]: _decode_column(np.asarray(arr[start:start + chunksize]), c)
+                            for c, arr in zip(columns, arrays)})
+
+
+def load_cached(csv_path: Path, parse, rebuild: bool = False, tag: str = "") -> pd.DataFrame:
+    """Return the dataset for ``csv_path`` from the cache, building it with ``parse`` if needed.
+
+    ``parse`` is called with the CSV path and must return the DataFrame to cache;
+    ``tag`` should change whenever ``parse`` would produce different dtypes.
+    Cache entries for older contents of the same file are removed once the new
+    one is in place.
+    """
+    csv_path = Path(csv_path).resolve()
+    target = cache_dir(csv_path, dataset_hash(csv_path), tag)
+    if not rebuild and (target / "meta.json").exists():
+        try:
+            return read_columns(target)
+        except (OSError, ValueError, KeyError):
+            pass                           # corrupt entry: fall through and rebuild it
+    df = parse(csv_path)
+    write_columns(df, target)
+    for stale in cache_root(csv_path).glob(f"{csv_path.stem}-v*-*"):
+        if stale != target:
+            shutil.rmtree(stale, ignore_errors=True)
+    return df
@@ -0,0 +1,205 @@
+"""Correlation statistics computed with batched linear algebra.
+
+``CorrelationAccumulator`` keeps pairwise-complete sufficient statistics for
+every pair of numeric columns as matrices built from a few matrix products
+(no per-pair loops). They add up across chunks or monthly appends, so a
+Pearson matrix can be refreshed without revisiting old rows: src.append keeps
+``correlation_sums`` of Pearson-only correlation steps and merges those of
+every new month (``merge_sums``); ``pearson_table`` turns them into the table.
+
+``correlation_table`` builds on it for the correlation-matrix step: Pearson
+and Spearman (Pearson of ranks) matrices with two-sided p-values and counts,
+overall and within strata, as one tidy table.
+"""
+import numpy as np
+import pandas as pd
+
+from src.schema import to_float64
+from src.stats import t_two_sided_p
+
+METHODS = ("pearson", "spearman")
+
+
+def numeric_columns(df: pd.DataFrame, exclude=("id",)) -> list:
+    # Measurement columns; identifiers and categoricals are not correlated
+    return [c for c in df.columns if c not in exclude and df[c].dtype.kind in "biuf"]
+
+
+def _matrix(df: pd.DataFrame, columns) -> np.ndarray:
+    return np.column_stack([to_float64(df[c]).to_numpy() for c in columns])
+
+
+class CorrelationAccumulator:
+    """Mergeable pairwise sums for Pearson correlations.
+
+    For columns i, j over the rows where both are present:
+    ``n[i, j]`` counts rows, ``sx[i, j]`` sums x_i, ``sxx[i, j]`` sums x_i**2
+    and ``sxy[i, j]`` sums x_i * x_j.
+    """
+
+    def __init__(self, columns, n=None, sx=None, sxx=None, sxy=None):
+        self.columns = list(columns)
+        k = len(self.columns)
+        zeros = lambda: np.zeros((k, k))
+        self.n = zeros() if n is None else n
+        self.sx = zeros() if sx is None else sx
+        self.sxx = zeros() if sxx is None else sxx
+        self.sxy = zeros() if sxy is None else sxy
+
+    def update(self, df: pd.DataFrame) -> "CorrelationAccumulator":
+        return self.update_matrix(_matrix(df, self.columns))
+
+    def update_matrix(self, x: np.ndarray) -> "CorrelationAccumulator":
+        """Add the rows of a float64 (rows x columns) array; NaN marks a missing value."""
+        if not np.isnan(x).any():
+            # Complete rows: every pair sees every row, so a single product is needed
+            self.n += len(x)
+            self.sx += x.sum(axis=0)[:, None]
+            self.sxx += np.einsum("ij,ij->j", x, x)[:, None]
+            self.sxy += x.T @ x
+            return self
+        m = (~np.isnan(x)).astype("float64")
+        xz = np.where(m > 0, x, 0.0)
+        self.n += m.T @ m
+        self.sx += xz.T @ m
+        self.sxx += (xz * xz).T @ m
+        self.sxy += xz.T @ xz
+        return self
+
+    def merge(self, other: "CorrelationAccumulator") -> "CorrelationAccumulator":
+        for name in ("n", "sx", "sxx", "sxy"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def pearson(self) -> pd.DataFrame:
+        n, sx, sxx, sxy = self.n, self.sx, self.sxx, self.sxy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = n * sxy - sx * sx.T
+            var = n * sxx - sx * sx
+            # A column that is constant over the pair's rows has no correlation (cancellation noise aside)
+            var = np.where(var <= 1e-12 * np.abs(n * sxx), np.nan, var)
+            r = cov / np.sqrt(var * var.T)
+        r = np.clip(r, -1.0, 1.0)
+        return pd.DataFrame(r, index=self.columns, columns=self.columns)
+
+    def counts(self) -> pd.DataFrame:
+        return pd.DataFrame(self.n.astype("int64"), index=self.columns, columns=self.columns)
+
+
+def _strata(df: pd.DataFrame, strata):
+    # (stratum, level, rows) of the overall matrix, then of each level of each stratum in sorted order
+    yield "all", "all", slice(None)
+    for col in strata:
+        for level, idx in df.groupby(col, observed=True, sort=True).indices.items():
+            yield col, str(level), idx
+
+
+def correlation_sums(df: pd.DataFrame, columns, strata=()) -> dict:
+    """{(stratum, level): CorrelationAccumulator} of ``columns``, overall and within each stratum level."""
+    x = _matrix(df, columns)
+    return {(stratum, level): CorrelationAccumulator(columns).update_matrix(x[rows])
+            for stratum, level, rows in _strata(df, strata)}
+
+
+def merge_sums(sums: dict, other: dict) -> dict:
+    """``sums`` plus ``other`` (``correlation_sums`` of more rows); new levels follow those of their stratum."""
+    merged = {}
+    for stratum in dict.fromkeys(s for s, _ in [*sums, *other]):
+        for key in dict.fromkeys(k for k in [*sums, *other] if k[0] == stratum):
+            if key in sums and key in other:
+                merged[key] = sums[key].merge(other[key])
+            else:
+                merged[key] = sums.get(key, other.get(key))
+    return merged
+
+
+def save_sums(sums: dict, path) -> None:
+    # One .npz: the (stratum, level) keys, the columns and the stacked sums
+    accs = list(sums.values())
+    np.savez(path, keys=np.array(list(sums), dtype=str).reshape(-1, 2), columns=np.array(accs[0].columns),
+             **{name: np.stack([getattr(a, name) for a in accs]) for name in ("n", "sx", "sxx", "sxy")})
+
+
+def load_sums(path) -> dict:
+    with np.load(path, allow_pickle=False) as z:
+        columns = z["columns"].tolist()
+        return {(str(stratum), str(level)): CorrelationAccumulator(columns, z["n"][i], z["sx"][i], z["sxx"][i],
+                                                                   z["sxy"][i])
+                for i, (stratum, level) in enumerate(z["keys"])}
+
+
+def rank_matrix(x: np.ndarray) -> np.ndarray:
+    """Average ranks (1-based, ties share a rank) of every column; NaNs stay NaN."""
+    out = np.full(x.shape, np.nan)
+    for j in range(x.shape[1]):
+        v = x[:, j]
+        ok = ~np.isnan(v)
+        # Measurements are rounded, so sorting the distinct values is much cheaper than the rows
+        _, inverse, counts = np.unique(v[ok], return_inverse=True, return_counts=True)
+        out[ok, j] = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+    return out
+
+
+def _matrices(x: np.ndarray, columns, method: str):
+    if method not in METHODS:
+        raise ValueError(f"unknown correlation method: {method!r}")
+    acc = CorrelationAccumulator(columns).update_matrix(rank_matrix(x) if method == "spearman" else x)
+    return acc.pearson(), acc.counts()
+
+
+def correlation_matrix(df: pd.DataFrame, columns, method: str = "pearson"):
+    """-> (r, n) square DataFrames over ``columns``, pairwise-complete.
+
+    Spearman ranks each column over its own non-missing values, which matches
+    the exact pairwise definition whenever the data has no NaNs.
+    """
+    return _matrices(_matrix(df, columns), columns, method)
+
+
+def p_values(r, n) -> np.ndarray:
+    """Two-sided p-values of H0: rho = 0 (t-test with n - 2 degrees of freedom)."""
+    r = np.asarray(r, dtype="float64")
+    df = np.asarray(n, dtype="float64") - 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = r * np.sqrt(df / (1 - r * r))
+    return t_two_sided_p(t, np.where(df > 0, df, np.nan))
+
+
+def _pairs(r: pd.DataFrame, n: pd.DataFrame) -> pd.DataFrame:
+    # Upper triangle of the matrices -> one row per column pair
+    i, j = np.triu_indices(len(r.columns), k=1)
+    rv = r.to_numpy()[i, j]
+    nv = n.to_numpy()[i, j]
+    names = np.array(r.columns, dtype=object)
+    return pd.DataFrame({"x": names[i], "y": names[j], "r": rv,
+                         "p_value": p_values(rv, nv), "n": nv})
+
+
+def correlation_table(df: pd.DataFrame, columns=None, methods=METHODS, strata=()) -> pd.DataFrame:
+    """Tidy correlations of every column pair, overall and within each stratum.
+
+    Columns: stratum ("all" or the stratifying column), level (its value),
+    method, x, y, r, p_value, n. Each (stratum level, method) is one batched
+    matrix computation over all columns.
+    """
+    columns = numeric_columns(df) if columns is None else list(columns)
+    x = _matrix(df, columns)           # upcast once; strata are row subsets of it
+    parts = []
+    for stratum, level, rows in _strata(df, strata):
+        part = x[rows]
+        for method in methods:
+            parts.append(_labelled(_pairs(*_matrices(part, columns, method)), stratum, level, method))
+    return pd.concat(parts, ignore_index=True)
+
+
+def pearson_table(sums: dict) -> pd.DataFrame:
+    """``correlation_table`` with ``methods=("pearson",)`` from ``correlation_sums`` instead of the rows."""
+    return pd.concat([_labelled(_pairs(acc.pearson(), acc.counts()), stratum, level, "pearson")
+                      for (stratum, level), acc in sums.items()], ignore_index=True)
+
+
+def _labelled(table: pd.DataFrame, stratum: str, level: str, method: str) -> pd.DataFrame:
+    table.insert(0, "method", method)
+    table.insert(0, "level", level)
+    table.insert(0, "stratum", stratum)
+    return table
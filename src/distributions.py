@@ -0,0 +1,133 @@
+"""Histograms and kernel density estimates of many columns at once.
+
+``sns.histplot(kde=True)`` bins and smooths one column at a time, and its KDE
+evaluates every observation against every grid point. Here all columns share
+one pass over the rows, in chunks of ``chunk_rows``:
+
+* histograms: per-column bin edges from ``np.histogram_bin_edges``
+  (``bins="auto"`` is the seaborn default), then the bin index of every value
+  in every column goes into a single ``np.bincount``; counts match
+  ``np.histogram`` exactly;
+* KDEs: the same pass spreads each value over the two nearest points of a fine
+  per-column grid (linear binning); the binned counts are convolved with the
+  Gaussian kernel (Scott's bandwidth, as seaborn) by FFT for all columns at
+  once and read off at seaborn's support (``gridsize`` points from the column
+  minimum to maximum, cut=0), scaled to counts like histplot does.
+
+Memory is bounded by one row chunk of the upcast columns, so the step scales
+to multi-million-row datasets.
+"""
+import numpy as np
+import pandas as pd
+
+from src.schema import to_float64
+
+
+def _column_stats(df: pd.DataFrame, columns, bins):
+    # Per column: finite count, min, max, std and the bin edges numpy (and so seaborn) would use
+    stats, edges = [], []
+    for c in columns:
+        x = to_float64(df[c]).to_numpy()
+        x = x[np.isfinite(x)]
+        if len(x) == 0:
+            stats.append({"n": 0, "lo": np.nan, "hi": np.nan, "std": np.nan, "bins": 0})
+            edges.append(np.array([]))
+            continue
+        e = np.histogram_bin_edges(x, bins)
+        stats.append({"n": len(x), "lo": x.min(), "hi": x.max(),
+                      "std": x.std(ddof=1) if len(x) > 1 else 0.0, "bins": len(e) - 1})
+        edges.append(e)
+    return pd.DataFrame(stats, index=list(columns)), edges
+
+
+def _grid_size(stats: pd.DataFrame, bw: np.ndarray, minimum: int = 1024, maximum: int = 1 << 16) -> int:
+    # Common KDE grid: spacing at most a quarter bandwidth in every column (power of two for the FFT)
+    ratio = np.where(bw > 0, (stats["hi"] - stats["lo"]) / np.where(bw > 0, bw, 1.0), 0.0)
+    need = int(np.nanmax(4 * ratio, initial=0)) + 2
+    return int(min(max(minimum, 1 << (need - 1).bit_length()), maximum))
+
+
+def distribution_tables(df: pd.DataFrame, columns, bins="auto", gridsize: int = 200,
+                        chunk_rows: int = 200_000):
+    """Histogram and KDE tables of ``columns`` in one chunked pass over the rows.
+
+    Returns ``(hist, kde)``: ``hist`` has column, bin, left, right, count;
+    ``kde`` has column, x, density and count (the density scaled to the
+    histogram, as histplot draws it). Columns without variance get no curve.
+    """
+    columns = list(columns)
+    empty_hist = pd.DataFrame(columns=["column", "bin", "left", "right", "count"])
+    empty_kde = pd.DataFrame(columns=["column", "x", "density", "count"])
+    if not columns:
+        return empty_hist, empty_kde
+    stats, edges = _column_stats(df, columns, bins)
+    k = len(columns)
+    nbins = stats["bins"].to_numpy()
+    offsets = np.concatenate([[0], np.cumsum(nbins)])
+    width = max(nbins.max(initial=0), 1)
+    padded = np.full((width + 1, k), np.inf)        # edges per column, padded for vectorized lookups
+    for j, e in enumerate(edges):
+        padded[:len(e), j] = e
+    first = np.where(np.isfinite(padded[0]), padded[0], 0.0)
+    span = np.array([e[-1] - e[0] if len(e) else 1.0 for e in edges])
+
+    # Scott's rule (seaborn's default): bw = std * n^(-1/5)
+    n = stats["n"].to_numpy(dtype="float64")
+    bw = np.where(n > 1, stats["std"].to_numpy() * np.maximum(n, 1) ** -0.2, 0.0)
+    lo, hi = np.nan_to_num(stats["lo"].to_numpy()), np.nan_to_num(stats["hi"].to_numpy())
+    m = _grid_size(stats, bw)
+    step = np.where(hi > lo, (hi - lo) / (m - 1), 1.0)
+
+    counts = np.zeros(offsets[-1], dtype="int64")
+    binned = np.zeros(m * k)
+    col = np.arange(k)
+    flat_edges = padded.T.ravel()                   # column j's edges start at j * (width + 1)
+    edge_base = col * (width + 1)
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        x = np.column_stack([to_float64(part[c]).to_numpy() for c in columns])
+        ok = np.isfinite(x)
+        complete = ok.all()
+        if not complete:
+            x = np.where(ok, x, first)               # placeholders, masked out below
+        keep = (lambda a: a.ravel()) if complete else (lambda a: a[ok])
+        # Histogram bin of each value, with np.histogram's corrections at the bin edges
+        idx = ((x - first) * (nbins / span)).astype(np.intp)
+        np.minimum(idx, np.maximum(nbins - 1, 0), out=idx)
+        idx -= (x < flat_edges.take(idx + edge_base)) & (idx > 0)
+        idx += (x >= flat_edges.take(idx + edge_base + 1)) & (idx < nbins - 1)
+        idx += offsets[:-1]
+        counts += np.bincount(keep(idx), minlength=len(counts))
+        # Linear binning onto the KDE grid
+        pos = np.clip((x - lo) / step, 0, m - 1)
+        left = np.minimum(pos.astype(np.intp), m - 2)
+        frac = pos - left
+        left += col * m
+        flat, frac = keep(left), keep(frac)
+        binned += np.bincount(flat, weights=1 - frac, minlength=m * k)
+        binned += np.bincount(flat + 1, weights=frac, minlength=m * k)
+
+    # Gaussian kernel on the grid offsets of each column; linear convolution via zero-padded FFT
+    grid = binned.reshape(k, m).T
+    size = 2 * m
+    offsets_grid = np.minimum(np.arange(size), size - np.arange(size))[:, None] * step
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kernel = np.exp(-0.5 * (offsets_grid / np.where(bw > 0, bw, np.nan)) ** 2) \
+            / (np.sqrt(2 * np.pi) * bw * np.maximum(n, 1))
+    density = np.fft.irfft(np.fft.rfft(grid, size, axis=0) * np.fft.rfft(kernel, axis=0), size, axis=0)[:m]
+
+    hist_parts, kde_parts = [], []
+    for j, c in enumerate(columns):
+        e = edges[j]
+        if len(e):
+            hist_parts.append(pd.DataFrame({"column": c, "bin": np.arange(nbins[j]), "left": e[:-1],
+                                            "right": e[1:], "count": counts[offsets[j]:offsets[j + 1]]}))
+        if bw[j] > 0:
+            support = np.linspace(lo[j], hi[j], gridsize)
+            d = np.interp(support, lo[j] + step[j] * np.arange(m), density[:, j])
+            d = np.maximum(d, 0)                      # FFT round-off around zero
+            scale = n[j] * (e[1] - e[0])              # histplot's hist_norm: sum(count * width)
+            kde_parts.append(pd.DataFrame({"column": c, "x": support, "density": d, "count": d * scale}))
+    hist = pd.concat(hist_parts, ignore_index=True) if hist_parts else empty_hist
+    kde = pd.concat(kde_parts, ignore_index=True) if kde_parts else empty_kde
+    return hist, kde
@@ -0,0 +1,226 @@
+"""Generic executor for declarative step specs (see src.specs)."""
+import os, platform, subprocess         # OS utilities to open files
+from functools import partial
+from pathlib import Path
+
+from src.aggregate import aggregate
+from src.bootstrap import bootstrap_means, bootstrap_slopes
+from src.correlation import correlation_matrix, correlation_table, numeric_columns, pearson_table
+from src.distributions import distribution_tables
+from src.panel import Panel
+from src.profiling import span
+from src.render import RenderQueue, chart_job
+from src.specs import CorrelationMatrix, Distributions, Step, Trends
+from src.store import ResultStore
+from src.trends import trend_tables
+from src.utils import load_dataset
+
+
+def _open_file(path: Path):
+    # Open a saved image with the system viewer; failures are ignored
+    try:
+        if platform.system() == "Windows":
+            os.startfile(str(path))
+        elif platform.system() == "Darwin":
+            subprocess.run(["open", str(path)])
+        else:
+            subprocess.run(["xdg-open", str(path)])
+    except Exception:
+        pass
+
+
+def bootstrap_tables(spec, df, tables: dict, n_boot: int = 1000, seed=0, level: float = 95) -> dict:
+    """Bootstrap uncertainty for every chart of ``spec``, batched per key set.
+
+    Bar charts get percentile CIs of each group mean, resampled from the raw
+    rows of ``df``; regression charts get CIs of the slope per hue group,
+    resampled from the aggregated points the chart fits. Returns {chart: table}.
+    """
+    batches = {}
+    for chart in spec.charts:
+        batches.setdefault((chart.kind, chart.keys), []).append(chart)
+    out = {}
+    for (kind, keys), charts in batches.items():
+        targets = [c.y for c in charts]
+        if kind == "bar":
+            res = bootstrap_means(df, keys, targets, n_boot=n_boot, level=level, seed=seed)
+        else:
+            # One wide frame of all targets sharing these keys, so slopes are resampled together
+            wide = tables[charts[0].request][[*keys, charts[0].y]]
+            for c in charts[1:]:
+                wide = wide.merge(tables[c.request][[*keys, c.y]], on=list(keys), how="outer")
+            res = bootstrap_slopes(wide, keys[0], targets, by=list(keys[1:]),
+                                   n_boot=n_boot, level=level, seed=seed)
+        for c in charts:
+            out[c] = res[res["target"] == c.y].reset_index(drop=True)
+    return out
+
+
+def run_step(spec, df, out_dir: Path, show: bool = False, open_after: bool = False,
+             render: RenderQueue = None, tables: dict = None, ci: dict = None,
+             bootstrap: dict = None, charts=None, results: ResultStore = None):
+    """Write every chart of ``spec``: its table to out/tab and its figure (via ``render``) to out/img.
+
+    ``tables`` holds precomputed aggregates keyed by ``Chart.request``; missing
+    ones are computed here in one pass per key set. Without a shared ``render``
+    queue figures are drawn inline, in order. ``ci`` selects the confidence
+    band method of regression charts (see ``src.options.CI_DEFAULT``). With
+    ``bootstrap`` (keyword arguments of ``bootstrap_tables``) a ``<stem>_boot.csv``
+    with resampled CIs is written next to each table. ``charts`` restricts the
+    run to a subset of ``spec.charts`` (used to refresh only changed outputs).
+    Tables go to ``results`` (a run-wide ``ResultStore``); without one they are
+    exported to out/tab as CSV and Markdown before returning.
+    """
+    out_dir = Path(out_dir)
+    img_dir = out_dir / "img"
+    tab_dir = out_dir / "tab"
+    img_dir.mkdir(parents=True, exist_ok=True)
+    tab_dir.mkdir(parents=True, exist_ok=True)
+    if render is None:
+        render = RenderQueue(show=show)
+    store = results if results is not None else ResultStore(tab_dir)
+    charts = spec.charts if charts is None else [c for c in spec.charts if c in charts]
+    tables = dict(tables or {})
+    missing = [c.request for c in charts if c.request not in tables]
+    if missing:
+        with span("aggregate", "aggregate"):
+            tables.update(aggregate(df, missing))
+
+    artifacts = {}
+    for chart in charts:
+        table = tables[chart.request]
+        # Tables go to the results store; the figure is queued for the render workers
+        csv_path = store.add(chart.table_stem, table, step=spec.name, kind=chart.kind,
+                             x=chart.x, y=chart.y, hue=chart.hue)
+        img_path = render.submit(chart_job(chart.kind, table, chart.x, chart.y, chart.palette,
+                                           chart.figure_title, img_dir / f"{chart.image_stem}.png",
+                                           hue=chart.hue, col=chart.col, ci=ci))
+        artifacts.setdefault("image", img_path)
+        artifacts.setdefault("table_csv", csv_path)
+
+    if bootstrap is not None:
+        with span("bootstrap", "aggregate"):
+            boot = bootstrap_tables(spec, df, tables, **bootstrap)
+        for chart, table in boot.items():
+            store.add(f"{chart.table_stem}_boot", table, step=spec.name, kind="bootstrap",
+                      x=chart.x, y=chart.y, hue=chart.hue)
+
+    if results is None:
+        store.flush()
+    if open_after and artifacts:
+        _open_file(artifacts["image"])
+    return artifacts  # first image/table, printed by the pipeline
+
+
+def run_correlation_matrix(spec, df, out_dir: Path, show: bool = False, open_after: bool = False,
+                           render: RenderQueue = None, tables: dict = None,
+                           results: ResultStore = None, sums: dict = None, **options):
+    """Write the tidy correlation table of ``spec`` to out/tab and the Pearson heatmap to out/img.
+
+    Needs row-level data, or for a Pearson-only spec its ``sums`` (src.correlation,
+    kept by src.append); CI/bootstrap options of chart steps do not apply and are ignored.
+    """
+    if df is None and sums is None:
+        raise ValueError("the correlation matrix needs row-level data (not available with --stream)")
+    out_dir = Path(out_dir)
+    img_dir = out_dir / "img"
+    tab_dir = out_dir / "tab"
+    img_dir.mkdir(parents=True, exist_ok=True)
+    tab_dir.mkdir(parents=True, exist_ok=True)
+    if render is None:
+        render = RenderQueue(show=show)
+    store = results if results is not None else ResultStore(tab_dir)
+    if sums is not None:
+        if not spec.summable:
+            raise ValueError(f"{spec.name}: only Pearson correlations can be computed from sums")
+        with span("correlation_table", "aggregate"):
+            table = pearson_table(sums)
+    else:
+        columns = numeric_columns(df, exclude=spec.exclude)
+        with span("correlation_table", "aggregate"):
+            table = correlation_table(df, columns, methods=spec.methods, strata=spec.strata)
+    csv_path = store.add(spec.stem, table, step=spec.name, kind="correlation")
+    if results is None:
+        store.flush()
+    with span("correlation_matrix", "aggregate"):
+        matrix = sums["all", "all"].pearson() if sums is not None else correlation_matrix(df, columns, "pearson")[0]
+    img_path = render.submit(chart_job("heatmap", matrix, None, None, "coolwarm",
+                                       "Pearson correlation", img_dir / f"{spec.image}.png"))
+    if open_after:
+        _open_file(img_path)
+    return {"image": img_path, "table_csv": csv_path}
+
+
+def run_distributions(spec, df, out_dir: Path, show: bool = False, open_after: bool = False,
+                      render: RenderQueue = None, tables: dict = None,
+                      results: ResultStore = None, **options):
+    """Write histogram and KDE tables of every numeric column to out/tab and their grid to out/img.
+
+    Needs row-level data; CI/bootstrap options of chart steps do not apply and are ignored.
+    """
+    if df is None:
+        raise ValueError("the histograms need row-level data (not available with --stream)")
+    out_dir = Path(out_dir)
+    img_dir = out_dir / "img"
+    tab_dir = out_dir / "tab"
+    img_dir.mkdir(parents=True, exist_ok=True)
+    tab_dir.mkdir(parents=True, exist_ok=True)
+    if render is None:
+        render = RenderQueue(show=show)
+    store = results if results is not None else ResultStore(tab_dir)
+    with span("distribution_tables", "aggregate"):
+        hist, kde = distribution_tables(df, numeric_columns(df, exclude=spec.exclude),
+                                        bins=spec.bins, gridsize=spec.gridsize)
+    csv_path = store.add(spec.stem, hist, step=spec.name, kind="histogram", x="left", y="count")
+    store.add(f"{spec.stem}_kde", kde, step=spec.name, kind="kde", x="x", y="count")
+    if results is None:
+        store.flush()
+    img_path = render.submit(chart_job("histograms", hist, "left", "count", spec.color, None,
+                                       img_dir / f"{spec.image}.png", hue=None, col="column", curves=kde))
+    if open_after:
+        _open_file(img_path)
+    return {"image": img_path, "table_csv": csv_path}
+
+
+def run_trends(spec, df, out_dir: Path, show: bool = False, open_after: bool = False,
+               render: RenderQueue = None, tables: dict = None,
+               results: ResultStore = None, **options):
+    """Write the per-subject trend table of ``spec`` and its cohort summaries to out/tab.
+
+    Pivots the rows into a subject x month panel (src.panel) once; needs
+    row-level data. There is no figure, and chart options are ignored.
+    """
+    if df is None:
+        raise ValueError("the trends need row-level data (not available with --stream)")
+    tab_dir = Path(out_dir) / "tab"
+    tab_dir.mkdir(parents=True, exist_ok=True)
+    store = results if results is not None else ResultStore(tab_dir)
+    with span("panel", "aggregate"):
+        panel = Panel.from_frame(df, metrics=spec.metrics, static=spec.by)
+    with span("trend_tables", "aggregate"):
+        subjects, cohorts, monthly = trend_tables(panel, spec.metrics, lower=spec.lower, by=spec.by,
+                                                  window=spec.window)
+    # One row per subject and metric: no Markdown copy (unreadable, and slow to format at 100k subjects)
+    csv_path = store.add(spec.stem, subjects, skip=("md",), step=spec.name, kind="trend", x="id", y="slope")
+    store.add(f"{spec.stem}_cohorts", cohorts, step=spec.name, kind="trend_summary", y="mean")
+    store.add(f"{spec.stem}_monthly", monthly, step=spec.name, kind="trend_monthly", x="month", y="value")
+    if results is None:
+        store.flush()
+    return {"table_csv": csv_path}
+
+
+# Executor of each spec type
+RUNNERS = {Step: run_step, CorrelationMatrix: run_correlation_matrix, Distributions: run_distributions,
+           Trends: run_trends}
+
+
+def build_steps(specs) -> dict:
+    # STEPS registry: CLI name -> callable(df, out_dir, show=..., render=..., tables=...)
+    return {spec.name: partial(RUNNERS[type(spec)], spec) for spec in specs}
+
+
+def standalone(spec, out_dir: Path = Path("out")):
+    # `python <Step>.py`: run one step on the default dataset and show each chart
+    import matplotlib.pyplot as plt
+    RUNNERS[type(spec)](spec, load_dataset(), out_dir, show=True)
+    plt.show()
@@ -0,0 +1,76 @@
+"""Content hashes of datasets, remembered per (path, mtime, size).
+
+Used by the binary column cache (``src.cache``) and the build manifest. Only
+the standard library is imported, so checking whether anything changed does
+not pay for loading NumPy or pandas.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+CACHE_DIRNAME = ".cache"
+
+
+def cache_root(csv_path: Path) -> Path:
+    return Path(csv_path).parent / CACHE_DIRNAME
+
+
+def content_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    # Streamed BLAKE2 digest of the file bytes (of every file, by name, for a column directory)
+    h = hashlib.blake2b(digest_size=16)
+    path = Path(path)
+    files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+    for f in files:
+        if path.is_dir():
+            h.update(f.name.encode())
+        with open(f, "rb") as fh:
+            for chunk in iter(lambda: fh.read(chunk_size), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def is_column_dir(path: Path) -> bool:
+    # A dataset given as a column directory (``write_columns`` / ``src.synth --format npy``)
+    return (Path(path) / "meta.json").is_file()
+
+
+def _read_index(root: Path) -> dict:
+    try:
+        return json.loads((root / "index.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: Path, payload) -> None:
+    # Atomic replace so a concurrent reader never sees a half-written file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(payload, fh, indent=1)
+    os.replace(tmp, path)
+
+
+def dataset_hash(csv_path: Path, save: bool = True) -> str:
+    """Content hash of ``csv_path``, reusing the stored one while (mtime, size) match.
+
+    For a column directory the (mtime, size) of its ``meta.json`` is checked,
+    which is rewritten whenever the directory is. A new hash is stored in the
+    cache index only with ``save`` and when the data directory is writable.
+    """
+    csv_path = Path(csv_path).resolve()
+    root = cache_root(csv_path)
+    st = (csv_path / "meta.json").stat() if csv_path.is_dir() else csv_path.stat()
+    index = _read_index(root)
+    entry = index.get(str(csv_path))
+    if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+        return entry["hash"]
+    digest = content_hash(csv_path)
+    if save:
+        index[str(csv_path)] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "hash": digest}
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+            _write_json(root / "index.json", index)
+        except OSError:         # read-only data directory: hash again next time
+            pass
+    return digest
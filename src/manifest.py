@@ -0,0 +1,110 @@
+"""Build manifest for incremental pipeline runs.
+
+``out/manifest.json`` records, per step, what its artifacts were built from:
+the content hash of the input data, a hash of the step spec and of the code
+that executes it, the run options and the library versions. A step whose
+record still matches and whose artifacts all exist is up to date and can be
+skipped.
+"""
+import hashlib
+import json
+import os
+import platform
+import tempfile
+from importlib import metadata
+from pathlib import Path
+
+from src.utils import ROOT
+
+MANIFEST_NAME = "manifest.json"
+LIBRARIES = ("numpy", "pandas", "matplotlib", "seaborn", "tabulate")
+
+
+def library_versions() -> dict:
+    versions = {"python": platform.python_version()}
+    for name in LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def _digest(chunks) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        h.update(chunk if isinstance(chunk, bytes) else str(chunk).encode())
+    return h.hexdigest()
+
+
+def code_files(step_name: str, spec=None) -> list:
+    # The engine modules of the spec's kind (``engine`` of src.specs; every src module when it has none)
+    # plus the step's own module (when it lives in its own file)
+    engine = getattr(spec, "engine", None)
+    files = sorted((ROOT / "src").glob("*.py")) if engine is None else \
+        sorted(ROOT / "src" / f"{m}.py" for m in set(engine))
+    module = ROOT / f"{step_name}.py"
+    if module.exists():
+        files.append(module)
+    return files
+
+
+def code_hash(step_name: str, spec=None) -> str:
+    return _digest(p.read_bytes() for p in code_files(step_name, spec))
+
+
+def spec_hash(spec, options: dict = None) -> str:
+    # Dataclass reprs are stable and list every field, so they make a good spec fingerprint
+    return _digest([repr(spec), json.dumps(options or {}, sort_keys=True, default=str)])
+
+
+class Manifest:
+    """Per-step build records stored as JSON in the output directory."""
+
+    def __init__(self, path: Path, steps: dict = None):
+        self.path = Path(path)
+        self.steps = steps or {}
+
+    @classmethod
+    def load(cls, out_dir: Path) -> "Manifest":
+        path = Path(out_dir) / MANIFEST_NAME
+        try:
+            steps = json.loads(path.read_text()).get("steps", {})
+        except (OSError, ValueError):
+            steps = {}
+        return cls(path, steps)
+
+    def stale_reason(self, name: str, record: dict, artifacts) -> str:
+        """Why ``name`` must be rebuilt, or None when it is up to date."""
+        old = self.steps.get(name)
+        if old is None:
+            return "never built"
+        for field, label in (("data", "input data changed"), ("spec", "step spec/options changed"),
+                             ("code", "step code changed"), ("libs", "library versions changed")):
+            if old.get(field) != record[field]:
+                return label
+        root = self.path.parent
+        missing = [a for a in artifacts if not (root / a).exists()]
+        if missing:
+            return f"missing artifact {missing[0]}" + (f" (+{len(missing) - 1} more)" if len(missing) > 1 else "")
+        return None
+
+    def record(self, name: str, record: dict, artifacts) -> None:
+        self.steps[name] = {**record, "artifacts": sorted(str(a) for a in artifacts)}
+
+    def forget(self, name: str) -> None:
+        # Outputs of `name` were produced outside a full build; rebuild them next time
+        self.steps.pop(name, None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"steps": self.steps}, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def step_record(name: str, spec, data_hash: str, options: dict = None) -> dict:
+    # Options (e.g. the CI method) are stored as well so the manifest documents how artifacts were made
+    return {"data": data_hash, "spec": spec_hash(spec, options), "options": options or {},
+            "code": code_hash(name, spec), "libs": library_versions()}
@@ -0,0 +1,47 @@
+"""Run options shared by the command line and the engine.
+
+Kept free of pandas/matplotlib imports so ``Pipeline.py`` can parse and
+validate its arguments before any heavy library is loaded.
+"""
+from src.specs import Bins
+
+# Confidence bands of regression charts, pipeline-wide:
+#   "analytic"  closed-form OLS band (fast, the default)
+#   "bootstrap" seaborn's resampled band with a fixed n_boot and seed (reproducible)
+#   "none"      regression line only
+CI_METHODS = ("analytic", "bootstrap", "none")
+CI_DEFAULT = {"method": "analytic", "level": 95, "n_boot": 1000, "seed": 0}
+
+# How figures are built:
+#   "seaborn"  a fresh lmplot/barplot figure per chart (reference look, the default)
+#   "template" reuse one figure skeleton per chart shape and swap its data (src.templates);
+#              shapes it does not cover fall back to seaborn
+RENDERERS = ("seaborn", "template")
+
+# Binned aggregation of regression charts over continuous x columns (src.binning):
+#   "width:N"     N equal-width bins between the minimum and maximum of x
+#   "quantile:N"  N bins holding about the same number of rows
+#   "none"        one point per distinct x value (the default)
+BIN_METHODS = ("width", "quantile")
+
+# File exports of the results store (src.store)
+EXPORT_FORMATS = ("csv", "md")
+
+
+def parse_export(value: str) -> tuple:
+    # "csv,md" -> ("csv", "md"); "none" or "" -> ()
+    formats = tuple(f.strip() for f in value.split(",") if f.strip() and f.strip() != "none")
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"unknown export format(s): {', '.join(unknown)}; choose from {', '.join(EXPORT_FORMATS)}")
+    return formats
+
+
+def parse_bins(value: str):
+    # "quantile:20" -> Bins("quantile", 20); "none" or "" -> None
+    if value.strip() in ("", "none"):
+        return None
+    method, _, n = value.strip().partition(":")
+    if method not in BIN_METHODS or not n.isdigit() or int(n) < 1:
+        raise ValueError(f"invalid binning {value!r}: use width:N, quantile:N (N >= 1) or none")
+    return Bins(method, int(n))
@@ -0,0 +1,265 @@
+"""Dense subject x month x metric panel of the dataset.
+
+The data is a panel: one row per ``id`` and ``month``. ``Panel`` pivots it once
+into a NumPy array ``values[subject, month, metric]`` with a ``mask[subject,
+month]`` of the cells that have a row, so per-subject and per-month work is
+array slicing (``panel.metric("vo2max")`` is a subjects x months matrix)
+instead of a groupby or pivot per question:
+
+* ``ids`` (sorted) and ``months`` (every month from the first to the last, so
+  gaps show up as masked cells) map positions back to labels; ``row``,
+  ``rows`` and ``col`` map labels to positions;
+* ``subjects`` holds per-subject attributes (e.g. sex, smoker), taken from
+  each subject's first row;
+* missing cells and missing measurements are NaN in ``values``.
+
+``save`` writes the arrays as ``.npy`` files (``subjects`` as a src.cache
+column directory) and ``Panel.load`` memory-maps them back. ``Panel.build``
+fills the on-disk arrays chunk by chunk from a CSV or column directory, so
+100k subjects over several years never need the long table in memory:
+
+    python -m src.panel data/set.csv --out data/panel --static sex,smoker
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import is_column_dir, iter_columns, read_columns, write_columns
+from src.correlation import numeric_columns
+from src.schema import iter_typed, to_float64
+
+PANEL_VERSION = 1
+
+
+def _ordinals(s: pd.Series) -> np.ndarray:
+    # Monthly period ordinals of a month column (periods, or labels like "2024-01")
+    if not isinstance(s.dtype, pd.PeriodDtype):
+        s = pd.Series(pd.PeriodIndex(s.astype(str), freq="M"))
+    return s.array.asi8
+
+
+def _check_unique(mask: np.ndarray, rows: int):
+    # Every row sets its own cell of the mask: fewer cells than rows means duplicates (O(cells), no sort)
+    if np.count_nonzero(mask) != rows:
+        raise ValueError("the panel has more than one row for some (id, month) cells")
+
+
+class Panel:
+    """``values[i, t, k]``: metric k of subject ``ids[i]`` in month ``months[t]``; ``mask[i, t]``: that row exists."""
+
+    def __init__(self, values, mask, ids, months, metrics, subjects: pd.DataFrame = None):
+        self.values = values
+        self.mask = mask
+        self.ids = np.asarray(ids)
+        self.months = pd.PeriodIndex(months, freq="M")
+        self.metrics = list(metrics)
+        self.subjects = subjects if subjects is not None else pd.DataFrame({"id": self.ids})
+        self._metric = {m: k for k, m in enumerate(self.metrics)}
+
+    def __repr__(self) -> str:
+        n, t, k = self.values.shape
+        return (f"Panel({n} subjects x {t} months ({self.months[0]}..{self.months[-1]}) x {k} metrics, "
+                f"{self.mask.mean():.0%} of cells present)") if n and t else "Panel(empty)"
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    # ---- index maps ----------------------------------------------------------------------------
+
+    def rows(self, ids) -> np.ndarray:
+        """Positions of subject ``ids`` (vectorized); KeyError for unknown ids."""
+        ids = np.asarray(ids)
+        pos = np.searchsorted(self.ids, ids).clip(max=max(len(self.ids) - 1, 0))
+        if not len(self.ids) or np.any(self.ids[pos] != ids):
+            raise KeyError(f"unknown subject id(s): {np.setdiff1d(ids, self.ids)[:10].tolist()}")
+        return pos
+
+    def row(self, id) -> int:
+        return int(self.rows([id])[0])
+
+    def col(self, month) -> int:
+        """Position of ``month`` (a Period or a label like "2024-03")."""
+        t = pd.Period(month, freq="M").ordinal - self.months[0].ordinal if len(self.months) else -1
+        if not 0 <= t < len(self.months):
+            raise KeyError(f"month {month} is outside {self.months[0]}..{self.months[-1]}")
+        return t
+
+    # ---- slices --------------------------------------------------------------------------------
+
+    def metric(self, name) -> np.ndarray:
+        """subjects x months view of one metric."""
+        return self.values[:, :, self._metric[name]]
+
+    def subject(self, id) -> pd.DataFrame:
+        """months x metrics table of one subject (absent months are NaN)."""
+        return pd.DataFrame(self.values[self.row(id)], index=self.months, columns=self.metrics)
+
+    def month(self, month) -> pd.DataFrame:
+        """subjects x metrics table of one month (subjects without a row are NaN)."""
+        return pd.DataFrame(self.values[:, self.col(month)], index=pd.Index(self.ids, name="id"),
+                            columns=self.metrics)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The long table back: one row per present cell, id and month first."""
+        i, t = np.nonzero(self.mask)
+        out = {"id": self.ids[i], "month": self.months[t]}
+        out.update({m: self.values[i, t, k] for m, k in self._metric.items()})
+        return pd.DataFrame(out)
+
+    # ---- construction --------------------------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, metrics=None, static=(), dtype="float64") -> "Panel":
+        """Pivot a long (id, month) table in one vectorized scatter.
+
+        ``metrics`` defaults to every numeric column except ``id`` and ``static``
+        ones; ``static`` columns become per-subject attributes in ``subjects``.
+        """
+        static = list(static)
+        metrics = list(metrics) if metrics is not None else numeric_columns(df, exclude=("id", *static))
+        rows, ids = pd.factorize(df["id"].to_numpy(), sort=True)
+        ordinals = _ordinals(df["month"])
+        first = ordinals.min() if len(ordinals) else 0
+        cols = ordinals - first
+        n_months = int(cols.max()) + 1 if len(cols) else 0
+        values = np.full((len(ids), n_months, len(metrics)), np.nan, dtype=dtype)
+        mask = np.zeros((len(ids), n_months), dtype=bool)
+        mask[rows, cols] = True
+        _check_unique(mask, len(rows))
+        for k, m in enumerate(metrics):
+            values[rows, cols, k] = to_float64(df[m]).to_numpy()
+        head = np.empty(len(ids), dtype=np.int64)
+        head[rows[::-1]] = np.arange(len(rows))[::-1]         # each subject's first row (the last write wins)
+        subjects = pd.DataFrame({"id": ids})
+        for c in static:
+            subjects[c] = df[c].iloc[head].reset_index(drop=True)
+        months = pd.PeriodIndex.from_ordinals(first + np.arange(n_months), freq="M")
+        return cls(values, mask, ids, months, metrics, subjects)
+
+    @classmethod
+    def build(cls, source, out_dir: Path, metrics=None, static=(), dtype="float64",
+              chunksize: int = 500_000) -> "Panel":
+        """Write the panel of a CSV or column directory to ``out_dir`` chunk by chunk; returns it memory-mapped.
+
+        A first pass reads only id, month and the ``static`` columns to size the
+        arrays; the second fills the memory-mapped arrays in place.
+        """
+        source, out_dir = Path(source), Path(out_dir)
+        chunks = iter_columns if is_column_dir(source) else iter_typed
+        static = list(static)
+        if metrics is None:
+            head = next(chunks(source, 1000))
+            metrics = numeric_columns(head, exclude=("id", *static))
+        metrics = list(metrics)
+        ids, heads, lo, hi = [], [], None, None
+        for chunk in chunks(source, chunksize, usecols={"id", "month", *static}):
+            ordinals = _ordinals(chunk["month"])
+            if len(ordinals):
+                lo = ordinals.min() if lo is None else min(lo, ordinals.min())
+                hi = ordinals.max() if hi is None else max(hi, ordinals.max())
+            heads.append(chunk[["id", *static]].drop_duplicates("id"))
+            ids.append(heads[-1]["id"].to_numpy())
+        ids = np.unique(np.concatenate(ids)) if ids else np.array([], dtype="int64")
+        subjects = (pd.concat(heads, ignore_index=True).drop_duplicates("id").sort_values("id")
+                    .reset_index(drop=True)) if heads else pd.DataFrame({"id": ids})
+        n_months = int(hi - lo) + 1 if lo is not None else 0
+
+        out_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=out_dir.parent, prefix=".panel-"))
+        try:
+            values = np.lib.format.open_memmap(tmp / "values.npy", mode="w+", dtype=dtype,
+                                               shape=(len(ids), n_months, len(metrics)))
+            values[:] = np.nan
+            mask = np.lib.format.open_memmap(tmp / "mask.npy", mode="w+", dtype=bool, shape=(len(ids), n_months))
+            seen = 0
+            for chunk in chunks(source, chunksize, usecols={"id", "month", *metrics}):
+                rows = np.searchsorted(ids, chunk["id"].to_numpy())
+                cols = _ordinals(chunk["month"]) - lo
+                mask[rows, cols] = True
+                for k, m in enumerate(metrics):
+                    values[rows, cols, k] = to_float64(chunk[m]).to_numpy()
+                seen += len(chunk)
+            _check_unique(mask, seen)
+            values.flush()
+            mask.flush()
+            del values, mask
+            months = [str(p) for p in pd.PeriodIndex.from_ordinals(lo + np.arange(n_months), freq="M")] \
+                if lo is not None else []
+            cls._write_meta(tmp, subjects, months, metrics, dtype, seen)
+            if out_dir.exists():
+                shutil.rmtree(out_dir)
+            os.replace(tmp, out_dir)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return cls.load(out_dir)
+
+    # ---- storage -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _write_meta(target: Path, subjects, months, metrics, dtype, rows):
+        write_columns(subjects, target / "subjects")
+        (target / "meta.json").write_text(json.dumps(
+            {"version": PANEL_VERSION, "months": months, "metrics": metrics,
+             "dtype": str(np.dtype(dtype)), "rows": int(rows)}, indent=1))
+
+    def save(self, out_dir: Path) -> Path:
+        """Write values.npy, mask.npy, subjects/ and meta.json into ``out_dir`` (atomically)."""
+        out_dir = Path(out_dir)
+        out_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=out_dir.parent, prefix=".panel-"))
+        try:
+            np.save(tmp / "values.npy", self.values, allow_pickle=False)
+            np.save(tmp / "mask.npy", self.mask, allow_pickle=False)
+            self._write_meta(tmp, self.subjects, [str(p) for p in self.months], self.metrics,
+                             self.values.dtype, self.mask.sum())
+            if out_dir.exists():
+                shutil.rmtree(out_dir)
+            os.replace(tmp, out_dir)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return out_dir
+
+    @classmethod
+    def load(cls, source: Path, mmap: bool = True) -> "Panel":
+        """Open a saved panel; with ``mmap`` the arrays stay on disk and pages load on access."""
+        source = Path(source)
+        meta = json.loads((source / "meta.json").read_text())
+        if meta.get("version") != PANEL_VERSION:
+            raise ValueError(f"{source} holds a panel of version {meta.get('version')}, expected {PANEL_VERSION}")
+        mode = "r" if mmap else None
+        values = np.load(source / "values.npy", mmap_mode=mode, allow_pickle=False)
+        mask = np.load(source / "mask.npy", mmap_mode=mode, allow_pickle=False)
+        subjects = read_columns(source / "subjects", mmap=False)
+        months = pd.PeriodIndex(meta["months"], freq="M")
+        return cls(values, mask, subjects["id"].to_numpy(), months, meta["metrics"], subjects)
+
+
+def main():
+    p = argparse.ArgumentParser(description="pivot a dataset into an on-disk id x month x metric panel")
+    p.add_argument("data", nargs="?", default=None, help="CSV or column directory (default: data/set.csv)")
+    p.add_argument("--out", required=True, help="panel directory to write")
+    p.add_argument("--metrics", default=None, help="comma-separated metric columns (default: all numeric)")
+    p.add_argument("--static", default="sex,smoker",
+                   help="comma-separated per-subject attributes kept in subjects/ (default: sex,smoker)")
+    p.add_argument("--dtype", choices=("float64", "float32"), default="float64")
+    p.add_argument("--chunksize", type=int, default=500_000)
+    args = p.parse_args()
+    from src.utils import DATA, resolve_data_path
+    split = lambda v: [c.strip() for c in v.split(",") if c.strip()] if v else []
+    panel = Panel.build(resolve_data_path(args.data or DATA), Path(args.out),
+                        metrics=split(args.metrics) or None, static=split(args.static),
+                        dtype=args.dtype, chunksize=args.chunksize)
+    print(f">>> {panel} written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
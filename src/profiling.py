@@ -0,0 +1,251 @@
+"""Run profiler: timed spans per step and chart, exported as a summary and a trace.
+
+Code marks its work with ``span(name, phase)``; the spans are no-ops until
+``enable`` installs a ``Profiler`` (``Pipeline.py --profile``). Phases:
+
+* ``load``       reading the dataset (or streaming it with --stream)
+* ``aggregate``  group-bys, correlation tables, bootstrap resampling
+* ``render``     building figures (seaborn, or filling a template)
+* ``encode``     rasterizing and compressing PNGs (for fresh seaborn figures
+                 this includes the Agg draw done by ``savefig``)
+* ``write``      putting PNG bytes and table exports on disk, the SQLite store
+* ``step``       the step itself; its self time is whatever no other phase covers
+
+Every span records wall and CPU time (CPU of its own thread) and the step and
+chart it belongs to; the labels of a span are inherited by the spans nested in
+it, and ``bind`` carries them over to background writer threads. Render
+worker processes (--jobs > 1) profile themselves and send their spans back
+with each chart. With ``memory=True`` tracemalloc also records the peak
+Python/NumPy allocation of each main-thread span (slower); the process peak
+RSS is always recorded per step.
+
+``Profiler.write`` produces ``profile.json`` (totals per phase, per step and
+per chart, hottest charts first, using self time so nested spans are not
+counted twice; threads and processes overlap, so phase totals can exceed
+the run's wall time) and ``trace.json`` in the Chrome trace event format, which
+chrome://tracing and https://ui.perfetto.dev open directly.
+"""
+import json
+import os
+import platform
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+PHASES = ("load", "aggregate", "render", "encode", "write")
+
+_ACTIVE = None                  # the installed Profiler, if any
+_local = threading.local()      # per thread: inherited labels, open spans (memory tracking)
+
+
+def _labels() -> dict:
+    return getattr(_local, "labels", {})
+
+
+def _peak_rss_mb() -> float:
+    # Peak resident set size of this process in MiB; None where neither `resource` (Unix) nor psutil is there
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)     # Windows
+        return peak / (1 << 20) if peak is not None else None
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if platform.system() == "Darwin" else rss / 1024
+
+
+class Profiler:
+    """Collects spans from every thread of this process (and from render workers via ``merge``)."""
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.origin_ns = time.perf_counter_ns()
+        self.cpu_origin = time.process_time()
+        self.events = []
+        self._lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name: str, phase: str, **labels):
+        labels = {**_labels(), **labels}
+        previous = _labels()
+        _local.labels = labels
+        track = self.memory and threading.current_thread() is threading.main_thread()
+        if track:
+            stack = _local.__dict__.setdefault("stack", [])
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)     # keep the parent's peak before resetting
+            tracemalloc.reset_peak()
+            stack.append([current, current])
+        start, cpu = time.perf_counter_ns(), time.thread_time_ns()
+        try:
+            yield
+        finally:
+            event = {"name": name, "phase": phase, "start_ns": start,
+                     "dur_ns": time.perf_counter_ns() - start, "cpu_ns": time.thread_time_ns() - cpu,
+                     "pid": os.getpid(), "tid": threading.get_ident(),
+                     "thread": threading.current_thread().name, **labels}
+            if track:
+                base, seen = stack.pop()
+                seen = max(seen, tracemalloc.get_traced_memory()[1])
+                event["alloc_peak_mb"] = (seen - base) / (1 << 20)
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], seen)
+            if phase == "step":
+                event["peak_rss_mb"] = _peak_rss_mb()
+            _local.labels = previous
+            with self._lock:
+                self.events.append(event)
+
+    def merge(self, events, **labels):
+        # Spans recorded in another process (a render worker); ``labels`` fill in missing ones
+        with self._lock:
+            self.events.extend({**labels, **e} for e in events)
+
+    def drain(self) -> list:
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    # ---- reports -----------------------------------------------------------------------------
+
+    def _self_times(self) -> list:
+        # (event, self wall ns, self cpu ns): children on the same thread are subtracted
+        out = []
+        by_thread = {}
+        for e in self.events:
+            by_thread.setdefault((e["pid"], e["tid"]), []).append(e)
+        for events in by_thread.values():
+            events.sort(key=lambda e: (e["start_ns"], -e["dur_ns"]))
+            stack = []                  # [event, child wall, child cpu]
+            for e in events + [None]:
+                while stack and (e is None or e["start_ns"] >= stack[-1][0]["start_ns"] + stack[-1][0]["dur_ns"]):
+                    done, wall, cpu = stack.pop()
+                    out.append((done, done["dur_ns"] - wall, done["cpu_ns"] - cpu))
+                    if stack:
+                        stack[-1][1] += done["dur_ns"]
+                        stack[-1][2] += done["cpu_ns"]
+                if e is not None:
+                    stack.append([e, 0, 0])
+        return out
+
+    def summary(self) -> dict:
+        """Totals per phase, per step (with its phases) and per chart; all times in seconds."""
+        def bucket():
+            return {"wall_s": 0.0, "cpu_s": 0.0, "spans": 0}
+
+        def add(b, wall, cpu):
+            b["wall_s"] += wall / 1e9
+            b["cpu_s"] += cpu / 1e9
+            b["spans"] += 1
+
+        phases, steps, charts = {}, {}, {}
+        for e, wall, cpu in self._self_times():
+            add(phases.setdefault(e["phase"], bucket()), wall, cpu)
+            step = e.get("step")
+            if step is not None:
+                s = steps.setdefault(step, {"wall_s": 0.0, "cpu_s": 0.0, "phases": {}})
+                add(s["phases"].setdefault(e["phase"], bucket()), wall, cpu)
+                if e["phase"] == "step":
+                    s["wall_s"] += e["dur_ns"] / 1e9
+                    s["cpu_s"] += e["cpu_ns"] / 1e9
+                    s["peak_rss_mb"] = e.get("peak_rss_mb")
+                    if "alloc_peak_mb" in e:
+                        s["alloc_peak_mb"] = e["alloc_peak_mb"]
+            chart = e.get("chart")
+            if chart is not None:
+                c = charts.setdefault(chart, {"chart": chart, "step": step, "total_s": 0.0,
+                                              **{p: 0.0 for p in PHASES}})
+                c[e["phase"]] = c.get(e["phase"], 0.0) + wall / 1e9
+                c["total_s"] += wall / 1e9
+        wall = max((e["start_ns"] + e["dur_ns"] for e in self.events), default=self.origin_ns) - self.origin_ns
+        for b in [*phases.values(), *steps.values(), *(p for s in steps.values() for p in s["phases"].values())]:
+            b["wall_s"], b["cpu_s"] = round(b["wall_s"], 6), round(b["cpu_s"], 6)
+        return {
+            "run": {"wall_s": round(wall / 1e9, 6),
+                    "cpu_s": round(time.process_time() - self.cpu_origin, 6),
+                    "peak_rss_mb": round(rss, 1) if (rss := _peak_rss_mb()) is not None else None,
+                    "memory_tracing": self.memory},
+            "phases": {p: phases[p] for p in sorted(phases, key=lambda p: -phases[p]["wall_s"])},
+            "steps": steps,
+            "charts": sorted(({k: round(v, 6) if isinstance(v, float) else v for k, v in c.items()}
+                              for c in charts.values()), key=lambda c: -c["total_s"]),
+        }
+
+    def trace(self) -> dict:
+        """Chrome trace events ("X" complete events, microseconds since the profiler started)."""
+        events, names = [], {}
+        for e in self.events:
+            names[(e["pid"], e["tid"])] = e["thread"] if e["pid"] == os.getpid() else f"render worker {e['pid']}"
+            args = {k: v for k, v in e.items()
+                    if k not in ("name", "phase", "start_ns", "dur_ns", "pid", "tid", "thread")}
+            args["cpu_ms"] = round(args.pop("cpu_ns") / 1e6, 3)
+            events.append({"name": e["name"], "cat": e["phase"], "ph": "X", "pid": e["pid"], "tid": e["tid"],
+                           "ts": (e["start_ns"] - self.origin_ns) / 1e3, "dur": e["dur_ns"] / 1e3,
+                           "args": args})
+        for (pid, tid), name in names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, out_dir: Path):
+        """Write profile.json and trace.json into ``out_dir``; returns both paths."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        summary_path, trace_path = out_dir / "profile.json", out_dir / "trace.json"
+        summary_path.write_text(json.dumps(self.summary(), indent=1))
+        trace_path.write_text(json.dumps(self.trace()))
+        return summary_path, trace_path
+
+
+def enable(memory: bool = False) -> Profiler:
+    global _ACTIVE
+    _local.__dict__.clear()         # a forked render worker must not inherit the parent's labels
+    _ACTIVE = Profiler(memory=memory)
+    return _ACTIVE
+
+
+def disable():
+    global _ACTIVE
+    if _ACTIVE is not None and _ACTIVE.memory:
+        tracemalloc.stop()
+    _ACTIVE = None
+
+
+def active():
+    return _ACTIVE
+
+
+@contextmanager
+def span(name: str, phase: str, **labels):
+    """Time the enclosed block as ``phase`` when profiling is enabled (otherwise a no-op)."""
+    if _ACTIVE is None:
+        yield
+        return
+    with _ACTIVE.span(name, phase, **labels):
+        yield
+
+
+def bind(fn):
+    # Carry the caller's labels (step, chart) into ``fn`` when it runs on another thread
+    labels = _labels()
+    if _ACTIVE is None or not labels:
+        return fn
+
+    @wraps(fn)
+    def bound(*args, **kwargs):
+        previous = _labels()
+        _local.labels = labels
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.labels = previous
+    return bound
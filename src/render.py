@@ -0,0 +1,258 @@
+import io
+from concurrent.futures import ProcessPoolExecutor, Future
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import matplotlib.pyplot as plt         # plotting (Matplotlib)
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+from matplotlib.image import imsave
+import seaborn as sns                   # statistical plots (Seaborn)
+
+from src import profiling
+from src.options import CI_DEFAULT, CI_METHODS, RENDERERS   # re-exported: CI modes and renderers
+from src.profiling import span
+from src.stats import ols_band
+from src.templates import render_template
+from src.writer import atomic_write
+
+
+def describe_ci(ci: dict) -> str:
+    if ci["method"] == "bootstrap":
+        return f"ci=bootstrap level={ci['level']} n_boot={ci['n_boot']} seed={ci['seed']}"
+    if ci["method"] == "analytic":
+        return f"ci=analytic level={ci['level']} (closed-form OLS)"
+    return "ci=none"
+
+
+def chart_job(kind, table, x, y, palette, title, path, hue="sex", col="sex", ci=None, curves=None):
+    # A render job is a plain dict (table + chart spec) so it can be shipped to worker processes.
+    # `curves` is an optional second table drawn over the first (the KDE lines of histograms)
+    return {"kind": kind, "table": table, "x": x, "y": y, "hue": hue, "col": col,
+            "palette": palette, "title": title, "path": str(path), "ci": ci or CI_DEFAULT,
+            "curves": curves}
+
+
+def _add_analytic_bands(g, job, level):
+    # Same look as seaborn's band (hue colour, alpha .15) over the fitted x range
+    table = job["table"]
+    colors = dict(zip(g.hue_names, sns.color_palette(job["palette"], len(g.hue_names))))
+    for facet, ax in g.axes_dict.items():
+        sub = table[table[job["col"]] == facet]
+        for level_name, part in sub.groupby(job["hue"], observed=True):
+            x = part[job["x"]].to_numpy(dtype="float64")
+            if len(x) < 3:
+                continue
+            grid = np.linspace(x.min(), x.max(), 100)
+            _, lower, upper = ols_band(x, part[job["y"]], grid, level)
+            ax.fill_between(grid, lower, upper, color=colors[level_name], alpha=.15, linewidth=0)
+
+
+def draw_chart(job):
+    # Build the figure for a job and return it (not saved, not closed)
+    if job["kind"] == "lm":
+        ci = job["ci"]
+        boot = ci["method"] == "bootstrap"
+        g = sns.lmplot(data=job["table"], x=job["x"], y=job["y"], hue=job["hue"],
+                       col=job["col"], palette=job["palette"],
+                       ci=ci["level"] if boot else None, n_boot=ci["n_boot"], seed=ci["seed"])
+        if ci["method"] == "analytic":
+            _add_analytic_bands(g, job, ci["level"])
+        g.fig.suptitle(job["title"])
+        g.fig.tight_layout()             # avoid layout overlaps
+        return g.fig
+    if job["kind"] == "bar":
+        fig, ax = plt.subplots(figsize=(6, 4))
+        sns.barplot(data=job["table"], x=job["x"], y=job["y"], hue=job["hue"],
+                    palette=job["palette"], ax=ax)
+        ax.set_title(job["title"])
+        fig.tight_layout()
+        return fig
+    if job["kind"] == "heatmap":
+        # Square correlation matrix; cells are annotated while they stay legible
+        k = len(job["table"])
+        fig, ax = plt.subplots(figsize=(max(12, k * .65), max(6, k * .4)))
+        sns.heatmap(job["table"], annot=k <= 30, fmt=".2f", annot_kws={"size": 8},
+                    cmap=job["palette"], center=0,
+                    linewidths=0.5 if k <= 60 else 0, cbar_kws={"shrink": 0.8}, ax=ax)
+        ax.grid(False)
+        ax.set_title(job["title"])
+        return fig
+    if job["kind"] == "histograms":
+        return _draw_histograms(job)
+    raise ValueError(f"unknown chart kind: {job['kind']!r}")
+
+
+def _draw_histograms(job, n_cols=3):
+    # Precomputed bins (and KDE curves) of several columns, one panel each, drawn like sns.histplot(kde=True)
+    table, curves = job["table"], job["curves"]
+    columns = list(dict.fromkeys(table[job["col"]]))
+    n_rows = max(1, -(-len(columns) // n_cols))
+    fig, axes = plt.subplots(n_rows, n_cols, figsize=(5 * n_cols, 4 * n_rows))
+    axes = np.atleast_1d(axes).flatten()
+    bars = to_rgba(job["palette"], .5)             # histplot's fill alpha when a KDE is drawn
+    line = to_rgba(job["palette"], 1)
+    for ax, (column, part) in zip(axes, table.groupby(job["col"], sort=False)):
+        left, right = part["left"].to_numpy(), part["right"].to_numpy()
+        drawn = ax.bar(left, part[job["y"]], width=right - left, align="edge", facecolor=bars,
+                       edgecolor=plt.rcParams["patch.edgecolor"])
+        # Edge width scaled to the narrowest bar, as histplot does
+        ax.autoscale_view()
+        x0 = left[0]
+        points = 72 / fig.dpi * abs(ax.transData.transform([(x0 + (right - left).min(), 0)])[0, 0]
+                                    - ax.transData.transform([(x0, 0)])[0, 0])
+        for bar in drawn:
+            bar.set_linewidth(min(.1 * points, bar.get_linewidth()))
+        curve = curves[curves[job["col"]] == column] if curves is not None else None
+        if curve is not None and len(curve):
+            ax.plot(curve["x"], curve[job["y"]], color=line)
+        ax.set_title(column)
+        ax.set_xlabel(column)
+        ax.set_ylabel("Count")
+        ax.grid(True)
+    for ax in axes[len(columns):]:
+        fig.delaxes(ax)                          # empty cells of the last row
+    fig.tight_layout()
+    return fig
+
+
+def _snapshot(fig, dpi):
+    # Rasterize a figure now (RGBA array), so the figure itself can be reused right away
+    canvas = FigureCanvasAgg(fig)
+    original = fig.dpi
+    fig.set_dpi(dpi)
+    try:
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba()).copy()
+    finally:
+        fig.set_dpi(original)
+
+
+def _encoded(encode, name):
+    # Encode the PNG in memory, then write its bytes, so both show up as phases when profiling
+    def write(path):
+        buf = io.BytesIO()
+        with span(name, "encode"):
+            encode(buf)
+        with span(name, "write"):
+            Path(path).write_bytes(buf.getbuffer())
+    return write
+
+
+def save_chart(fig, job, tight=True, writer=None):
+    """Write ``fig`` as a 300-dpi PNG, atomically; in the background when a ``writer`` is given.
+
+    Regression charts record their CI method in the PNG metadata. Templates
+    have a fixed layout and skip the extra draw of bbox_inches="tight".
+    """
+    metadata = {"Description": describe_ci(job["ci"])} if job["kind"] == "lm" else None
+    name = Path(job["path"]).name
+    if writer is not None and not tight:
+        # Template figures are redrawn by the next chart: rasterize here, encode on the writer
+        with span(name, "encode"):
+            rgba = _snapshot(fig, 300)
+        writer.submit(job["path"], _encoded(partial(imsave, arr=rgba, format="png", dpi=300,
+                                                    metadata=metadata), name))
+        return
+    write = _encoded(partial(fig.savefig, format="png", dpi=300, bbox_inches="tight" if tight else None,
+                             metadata=metadata), name)
+    if writer is not None:
+        writer.submit(job["path"], write)      # a fresh figure: the writer owns it from now on
+    else:
+        atomic_write(job["path"], write)
+
+
+def render_chart(job, renderer="seaborn", writer=None):
+    # Draw and save at 300 dpi; runs in the caller or in a render worker
+    chart = Path(job["path"]).stem
+    with span(chart, "render", chart=chart):
+        if renderer == "template" and render_template(job, partial(save_chart, writer=writer)) is not None:
+            return job["path"]
+        fig = draw_chart(job)
+        plt.close(fig)                   # pyplot forgets the figure; it can still be saved
+        save_chart(fig, job, writer=writer)
+    return job["path"]
+
+
+def _init_render_worker(profile=False, memory=False):
+    # Render workers never open windows; they profile themselves when the pipeline does
+    plt.switch_backend("Agg")
+    if profile:
+        profiling.enable(memory=memory)
+
+
+def _render_in_worker(job, renderer):
+    # -> (path, spans recorded for this job in the worker process)
+    path = render_chart(job, renderer)
+    profiler = profiling.active()
+    return path, profiler.drain() if profiler is not None else []
+
+
+class RenderQueue:
+    """Collects chart jobs from steps and renders them inline or on a process pool.
+
+    With ``jobs=0`` every job is rendered immediately in the calling process
+    (this is what standalone ``python Correlation_*.py`` runs use, and the only
+    mode that can ``show`` figures). With ``jobs>0`` jobs go to a pool of render
+    workers and ``submit`` returns at once, so the caller can carry on with the
+    next aggregation while PNGs are encoded in the background. Inline jobs
+    hand their PNG encoding to ``writer`` (a ``src.writer.ArtifactWriter``)
+    when one is given. ``renderer`` is one of ``RENDERERS``; figures that are
+    shown always use seaborn.
+    """
+
+    def __init__(self, jobs=0, show=False, renderer="seaborn", writer=None):
+        self.show = show
+        self.renderer = renderer
+        self.writer = writer
+        self.owner = None                # label attached to submitted jobs (the running step)
+        profiler = profiling.active()
+        self._pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker,
+                                         initargs=(profiler is not None, profiler is not None and profiler.memory)) \
+            if jobs > 0 else None
+        self._pending = []               # (owner, future) in submission order
+
+    def submit(self, job):
+        if self._pool is not None:
+            fut = self._pool.submit(_render_in_worker, job, self.renderer)
+        elif not self.show:
+            # Inline and headless: errors propagate to the step that submitted the job
+            fut = Future()
+            fut.set_result((render_chart(job, self.renderer, self.writer), []))
+        else:
+            # Interactive: keep each chart's own figure open until its window is closed
+            fig = draw_chart(job)
+            save_chart(fig, job)
+            plt.show(block=True)   # ← this chart's window stays open until you close it
+            plt.close(fig)
+            fut = Future()
+            fut.set_result((job["path"], []))
+        self._pending.append((self.owner, fut))
+        return Path(job["path"])
+
+    def drain(self):
+        # Wait for every submitted job; returns [(owner, path, error)] in submission order
+        done = []
+        for owner, fut in self._pending:
+            try:
+                path, spans = fut.result()
+                if spans and profiling.active() is not None:
+                    profiling.active().merge(spans, step=owner)
+                done.append((owner, path, None))
+            except Exception as e:
+                done.append((owner, None, e))
+        self._pending = []
+        return done
+
+    def close(self):
+        results = self.drain()
+        if self._pool is not None:
+            self._pool.shutdown()
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,162 @@
+"""Declared column types for the fitness dataset (data/set.csv).
+
+``read_typed`` parses the CSV straight into compact dtypes: categoricals for
+labels, the smallest integer type that holds each count, float32 for
+measurements recorded with one or two decimals, and a monthly period for
+``month``. Run ``python -m src.schema [path]`` for a per-column memory report.
+"""
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SEX_CATEGORIES = ["female", "male"]
+
+# column -> target dtype. Integer columns are downcast only when every value fits,
+# otherwise they keep the parser's int64 (or become nullable when they contain gaps).
+SCHEMA = {
+    "id": "int32",
+    "month": "period[M]",
+    "age": "int8",
+    "sex": pd.CategoricalDtype(SEX_CATEGORIES),
+    "height_cm": "float32",
+    "weight_kg": "float32",
+    "bmi": "float32",
+    "body_fat_pct": "float32",
+    "weekly_workouts": "int8",
+    "steps_per_day": "int32",
+    "sleep_hours": "float32",
+    "stress_level": "float32",
+    "calorie_intake": "int16",
+    "protein_g": "int16",
+    "alcohol_units_per_week": "float32",
+    "smoker": "int8",
+    "vo2max": "float32",
+    "run_5k_min": "float32",
+    "resting_hr": "int16",
+    "systolic_bp": "int16",
+    "diastolic_bp": "int16",
+    "bench_1rm_kg": "float32",
+    "squat_1rm_kg": "float32",
+    "max_pushups": "int16",
+    "ldl_mg_dL": "int16",
+    "hdl_mg_dL": "int16",
+    "triglycerides_mg_dL": "int16",
+}
+
+
+# Recorded precision of the float32 columns. float32 holds ~7 significant digits, so
+# these values round-trip exactly once upcast and rounded back (see `to_float64`).
+DECIMALS = {
+    "height_cm": 1, "weight_kg": 1, "bmi": 1, "body_fat_pct": 1,
+    "sleep_hours": 2, "stress_level": 1, "alcohol_units_per_week": 1,
+    "vo2max": 1, "run_5k_min": 2, "bench_1rm_kg": 1, "squat_1rm_kg": 1,
+}
+
+
+def to_float64(s: pd.Series) -> pd.Series:
+    """Upcast a column for arithmetic, restoring the exact recorded decimals of float32 columns."""
+    out = s.astype("float64")
+    if s.dtype == np.float32 and s.name in DECIMALS:
+        out = out.round(DECIMALS[s.name])
+    return out
+
+
+def fingerprint() -> str:
+    # Short hash of the declared types; part of the binary cache key
+    return hashlib.blake2b(repr(sorted((k, str(v)) for k, v in SCHEMA.items())).encode(),
+                           digest_size=4).hexdigest()
+
+
+def _is_int(dtype) -> bool:
+    return isinstance(dtype, str) and dtype.startswith("int")
+
+
+def _parse_dtypes(columns) -> dict:
+    # dtypes the CSV parser can produce directly (floats and categoricals)
+    out = {}
+    for col in columns:
+        dtype = SCHEMA.get(col)
+        if dtype is None or _is_int(dtype):
+            continue
+        # Periods are parsed per distinct label: read them as categories first
+        out[col] = "category" if str(dtype).startswith("period") else dtype
+    return out
+
+
+def _downcast_int(s: pd.Series, dtype: str) -> pd.Series:
+    info = np.iinfo(dtype)
+    if s.isna().any():
+        dtype = dtype.capitalize()       # nullable Int8/Int16/Int32
+    if s.dtype.kind not in "iuf" or s.min() < info.min or s.max() > info.max:
+        return s
+    if s.dtype.kind == "f" and not s.dropna().mod(1).eq(0).all():
+        return s                         # fractional values: not an integer column after all
+    return s.astype(dtype)
+
+
+def _to_period(s: pd.Series) -> pd.Series:
+    # Parse each distinct label once (the panel has few months), then broadcast by code
+    if isinstance(s.dtype, pd.PeriodDtype):
+        return s
+    codes, labels = pd.factorize(s)
+    periods = pd.PeriodIndex(labels.astype(str), freq="M").take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(periods, index=s.index, name=s.name)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the columns of ``df`` that appear in SCHEMA to their declared dtype."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        dtype = SCHEMA.get(col)
+        if dtype is None or s.dtype == dtype:
+            out[col] = s
+        elif _is_int(dtype):
+            out[col] = _downcast_int(s, dtype)
+        elif str(dtype).startswith("period"):
+            out[col] = _to_period(s)
+        else:
+            out[col] = s.astype(dtype)
+    return pd.DataFrame(out, index=df.index)
+
+
+def read_typed(path, **kwargs) -> pd.DataFrame:
+    """``pd.read_csv`` with the declared schema applied at parse time."""
+    header = pd.read_csv(path, nrows=0).columns
+    df = pd.read_csv(path, dtype=_parse_dtypes(header), **kwargs)
+    return apply_schema(df)
+
+
+def iter_typed(path, chunksize: int, usecols=None):
+    """Stream the CSV in chunks of ``chunksize`` rows, each with the declared schema applied."""
+    header = pd.read_csv(path, nrows=0).columns
+    if usecols is not None:
+        header = [c for c in header if c in set(usecols)]
+    reader = pd.read_csv(path, dtype=_parse_dtypes(header), usecols=usecols, chunksize=chunksize)
+    for chunk in reader:
+        yield apply_schema(chunk)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Bytes per column before/after typing, with the saving per column and a total row."""
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_before": b,
+        "bytes_after": a,
+    })
+    report.loc["TOTAL"] = ["", "", b.sum(), a.sum()]
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    report["ratio"] = (report["bytes_before"] / report["bytes_after"]).round(2)
+    return report
+
+
+if __name__ == "__main__":
+    from src.utils import DATA
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA
+    print(memory_report(pd.read_csv(path), read_typed(path)).to_string())
@@ -0,0 +1,156 @@
+"""Declarative chart and step specifications.
+
+A step is a named list of charts; a chart is fully described by its x and y
+columns, the hue/facet columns, the plot kind and the output names. The
+generic executor (``src.executor``) turns specs into tables and figures, so the
+pipeline can see every chart up front and batch, dedupe and parallelize the
+work. ``CorrelationMatrix`` and ``Distributions`` describe steps that work on whole
+columns instead of per-chart aggregates, ``Trends`` one that follows every subject
+over the months (src.trends). A chart with ``Bins`` aggregates per
+bin of a continuous x column instead of per distinct value (src.binning).
+"""
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import ClassVar
+
+# src modules whose code shapes every step's outputs (loading, typing, the runner, the table exports)
+ENGINE_COMMON = ("specs", "executor", "store", "utils", "schema", "cache", "hashing")
+# run options that shape every step's outputs (which table files are written, and where)
+OPTIONS_COMMON = ("export", "store")
+
+
+@dataclass(frozen=True)
+class Bins:
+    method: str = "quantile"    # "width": equal-width bins, "quantile": equal-count bins, "edges": `edges`
+    n: int = 20                 # number of bins ("width", "quantile"); ties can merge quantile bins
+    edges: tuple = ()           # increasing bin edges ("edges"); values outside them are left out
+
+    def __str__(self) -> str:
+        if self.method == "edges":
+            return "edges:" + ",".join(f"{e:g}" for e in self.edges)
+        return f"{self.method}:{self.n}"
+
+
+@dataclass(frozen=True)
+class Chart:
+    x: str
+    y: str
+    kind: str = "lm"            # "lm": regression per facet, "bar": grouped bars
+    palette: str = "deep"
+    hue: str = "sex"
+    col: str = "sex"            # facet column ("lm" only)
+    stem: str = None            # table file stem; default Correlation_<x>_<hue>_<y>
+    image: str = None           # image file stem when it differs from `stem`
+    title: str = None           # figure title; default `stem`
+    bins: Bins = None           # aggregate per bin of x rather than per distinct x value
+
+    @property
+    def keys(self) -> tuple:
+        return (self.x, self.hue)
+
+    @property
+    def request(self) -> tuple:
+        # (group keys, target) pair understood by src.aggregate; binned charts add their Bins
+        return (self.keys, self.y) if self.bins is None else (self.keys, self.y, self.bins)
+
+    @property
+    def table_stem(self) -> str:
+        return self.stem or f"Correlation_{self.x}_{self.hue}_{self.y}"
+
+    @property
+    def image_stem(self) -> str:
+        return self.image or self.table_stem
+
+    @property
+    def figure_title(self) -> str:
+        return self.title or self.table_stem
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    charts: tuple
+    # src modules the step's outputs depend on (src.manifest hashes them); not part of the spec itself
+    engine: ClassVar[tuple] = ENGINE_COMMON + ("aggregate", "binning", "summary", "stream", "append",
+                                               "bootstrap", "render", "templates", "stats", "options")
+    options: ClassVar[tuple] = OPTIONS_COMMON + ("ci", "bootstrap", "renderer")   # recorded in the manifest
+
+    @property
+    def requests(self) -> list:
+        return [c.request for c in self.charts]
+
+    def binned(self, bins: Bins, columns) -> "Step":
+        # Copy of the step whose regression charts over one of `columns` aggregate per bin of x
+        # (charts that declare their own bins keep them)
+        return replace(self, charts=tuple(
+            replace(c, bins=bins) if c.kind == "lm" and c.bins is None and c.x in columns else c
+            for c in self.charts))
+
+    def artifacts(self, bootstrap: bool = False) -> list:
+        # Files the step must leave behind, relative to out_dir (Markdown is optional: needs tabulate)
+        out = []
+        for chart in self.charts:
+            out.append(Path("tab") / f"{chart.table_stem}.csv")
+            out.append(Path("img") / f"{chart.image_stem}.png")
+            if bootstrap:
+                out.append(Path("tab") / f"{chart.table_stem}_boot.csv")
+        return out
+
+
+@dataclass(frozen=True)
+class CorrelationMatrix:
+    name: str
+    methods: tuple = ("pearson", "spearman")
+    strata: tuple = ()          # columns to stratify by, in addition to the overall matrix
+    exclude: tuple = ("id",)    # numeric columns left out of the matrix
+    stem: str = "Correlation_matrix"
+    image: str = "heatmap"      # heatmap of the overall Pearson matrix
+    charts: tuple = ()          # no per-chart aggregates
+    requests: tuple = ()
+    engine: ClassVar[tuple] = ENGINE_COMMON + ("correlation", "stats", "render", "templates", "options")
+    options: ClassVar[tuple] = OPTIONS_COMMON     # the heatmap ignores --ci/--bootstrap/--renderer
+
+    @property
+    def summable(self) -> bool:
+        # Pearson-only matrices add up across monthly appends (src.append keeps their sums); ranks do not
+        return tuple(self.methods) == ("pearson",)
+
+    def artifacts(self, bootstrap: bool = False) -> list:
+        return [Path("tab") / f"{self.stem}.csv", Path("img") / f"{self.image}.png"]
+
+
+@dataclass(frozen=True)
+class Distributions:
+    name: str
+    exclude: tuple = ()         # numeric columns left out of the grid
+    bins: object = "auto"       # np.histogram_bin_edges rule or a bin count per column
+    gridsize: int = 200         # KDE evaluation points per column
+    color: str = "steelblue"
+    stem: str = "Histograms"    # tables <stem>.csv (bins) and <stem>_kde.csv (curves)
+    image: str = "histograms"
+    charts: tuple = ()          # no per-chart aggregates
+    requests: tuple = ()
+    engine: ClassVar[tuple] = ENGINE_COMMON + ("distributions", "correlation", "render", "templates", "options")
+    options: ClassVar[tuple] = OPTIONS_COMMON
+
+    def artifacts(self, bootstrap: bool = False) -> list:
+        return [Path("tab") / f"{self.stem}.csv", Path("tab") / f"{self.stem}_kde.csv",
+                Path("img") / f"{self.image}.png"]
+
+
+@dataclass(frozen=True)
+class Trends:
+    name: str
+    metrics: tuple = ("vo2max", "resting_hr", "run_5k_min", "body_fat_pct", "bench_1rm_kg",
+                      "squat_1rm_kg", "max_pushups")
+    lower: tuple = ("resting_hr", "run_5k_min", "body_fat_pct")   # metrics where a decrease is an improvement
+    by: tuple = ("sex", "smoker")   # cohorts of the summaries
+    window: int = 3             # months per rolling mean
+    stem: str = "Trends"        # tables <stem>.csv (per subject), <stem>_cohorts.csv, <stem>_monthly.csv
+    charts: tuple = ()          # no per-chart aggregates
+    requests: tuple = ()
+    engine: ClassVar[tuple] = ENGINE_COMMON + ("panel", "trends", "summary", "binning", "correlation")
+    options: ClassVar[tuple] = OPTIONS_COMMON
+
+    def artifacts(self, bootstrap: bool = False) -> list:
+        return [Path("tab") / f"{self.stem}{suffix}.csv" for suffix in ("", "_cohorts", "_monthly")]
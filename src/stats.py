@@ -0,0 +1,127 @@
+"""Closed-form statistics used by the renderers (no SciPy required)."""
+import math
+
+import numpy as np
+
+
+def normal_ppf(p: float) -> float:
+    # Acklam's rational approximation of the standard normal quantile (|error| < 1.2e-9)
+    a = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+         1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+    b = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+         6.680131188771972e+01, -1.328068155288572e+01)
+    c = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+         -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+    d = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+         3.754408661907416e+00)
+    if p < 0.02425:
+        q = math.sqrt(-2 * math.log(p))
+        return (((((c[0]*q + c[1])*q + c[2])*q + c[3])*q + c[4])*q + c[5]) / \
+               ((((d[0]*q + d[1])*q + d[2])*q + d[3])*q + 1)
+    if p > 1 - 0.02425:
+        return -normal_ppf(1 - p)
+    q = p - 0.5
+    r = q * q
+    return (((((a[0]*r + a[1])*r + a[2])*r + a[3])*r + a[4])*r + a[5])*q / \
+           (((((b[0]*r + b[1])*r + b[2])*r + b[3])*r + b[4])*r + 1)
+
+
+def t_ppf(p: float, df: float) -> float:
+    """Student-t quantile: closed forms for df = 1 and 2, otherwise the Cornish-Fisher expansion
+    polished by Newton steps on the exact CDF (``t_two_sided_p``)."""
+    if df <= 0 or not 0 < p < 1:
+        return float("nan")
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))                    # Cauchy
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = normal_ppf(p)
+    g1 = (z**3 + z) / 4
+    g2 = (5*z**5 + 16*z**3 + 3*z) / 96
+    g3 = (3*z**7 + 19*z**5 + 17*z**3 - 15*z) / 384
+    g4 = (79*z**9 + 776*z**7 + 1482*z**5 - 1920*z**3 - 945*z) / 92160
+    t = z + g1/df + g2/df**2 + g3/df**3 + g4/df**4
+    log_norm = math.lgamma((df + 1) / 2) - math.lgamma(df / 2) - 0.5 * math.log(df * math.pi)
+    for _ in range(3):
+        tail = float(t_two_sided_p(t, df)) / 2                  # P(T > |t|)
+        cdf = 1 - tail if t > 0 else tail
+        pdf = math.exp(log_norm - (df + 1) / 2 * math.log1p(t * t / df))
+        t -= (cdf - p) / pdf
+    return t
+
+
+def ols_band(x, y, grid, level: float = 95):
+    """Fitted line and confidence band of the mean response for a simple OLS fit.
+
+    Returns ``(fit, lower, upper)`` evaluated on ``grid``; all-NaN when the fit
+    is undefined (fewer than 3 points or constant x).
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    grid = np.asarray(grid, dtype="float64")
+    ok = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[ok], y[ok]
+    n = len(x)
+    nan = np.full_like(grid, np.nan)
+    if n < 3:
+        return nan, nan, nan
+    x_mean, y_mean = x.mean(), y.mean()
+    dx = x - x_mean
+    sxx = dx @ dx
+    if sxx == 0:
+        return nan, nan, nan
+    slope = (dx @ (y - y_mean)) / sxx
+    intercept = y_mean - slope * x_mean
+    resid = y - (intercept + slope * x)
+    s = math.sqrt((resid @ resid) / (n - 2))
+    fit = intercept + slope * grid
+    half = t_ppf(0.5 + level / 200, n - 2) * s * np.sqrt(1 / n + (grid - x_mean) ** 2 / sxx)
+    return fit, fit - half, fit + half
+
+
+def _lgamma(x):
+    return np.vectorize(math.lgamma, otypes=[float])(x)
+
+
+def betainc(a, b, x, max_iter: int = 300, eps: float = 3e-14):
+    """Regularized incomplete beta I_x(a, b), vectorized (continued fraction, modified Lentz)."""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype="float64") for v in (a, b, x)))
+    out = np.full(x.shape, np.nan)
+    out[x <= 0] = 0.0
+    out[x >= 1] = 1.0
+    inner = (x > 0) & (x < 1) & (a > 0) & (b > 0)
+    if not inner.any():
+        return out
+    a, b, x = a[inner], b[inner], x[inner]
+    # Use the symmetry I_x(a, b) = 1 - I_{1-x}(b, a) where the fraction converges faster
+    flip = x > (a + 1) / (a + b + 2)
+    a, b, x = np.where(flip, b, a), np.where(flip, a, b), np.where(flip, 1 - x, x)
+    front = np.exp(_lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)) / a
+    tiny = 1e-300
+    c = np.ones_like(x)
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+    f = d.copy()
+    for m in range(1, max_iter + 1):
+        for num in (m * (b - m) * x / ((a + 2*m - 1) * (a + 2*m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2*m) * (a + 2*m + 1))):
+            d = 1 + num * d
+            d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+            c = 1 + num / c
+            c = np.where(np.abs(c) < tiny, tiny, c)
+            f *= c * d
+        if np.all(np.abs(c * d - 1) < eps):
+            break
+    res = front * f
+    out[inner] = np.where(flip, 1 - res, res)
+    return out
+
+
+def t_two_sided_p(t, df):
+    """Two-sided p-value of Student-t statistics ``t`` with ``df`` degrees of freedom."""
+    t = np.asarray(t, dtype="float64")
+    df = np.asarray(df, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = df / (df + t * t)
+    p = betainc(df / 2, 0.5, np.where(np.isinf(t), 0.0, x))
+    return np.where(df > 0, p, np.nan)
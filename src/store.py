@@ -0,0 +1,122 @@
+"""Results store: every aggregate table of a run in one place.
+
+Steps hand their finished tables to a ``ResultStore`` instead of writing files
+themselves. With a background ``writer`` attached the file exports are queued
+as soon as a table arrives; at the end of the run ``flush`` writes the rest in
+bulk:
+
+* into a single SQLite file (optional), one SQL table per aggregate plus a
+  ``results`` metadata table (step, kind, x, y, hue, rows, run id, data hash),
+  so consumers can query results without parsing many files;
+* as CSV and/or Markdown files in out/tab (the ``export`` formats).
+
+``python -m src.store out/results.sqlite --export csv,md --out out/tab``
+re-exports files from an existing store.
+"""
+import argparse
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from src.options import EXPORT_FORMATS, parse_export   # re-exported for `from src.store import ...`
+from src.profiling import span
+from src.utils import write_table
+
+META_TABLE = "results"
+META_COLUMNS = ("name", "step", "kind", "x", "y", "hue", "rows", "run_id", "data_hash", "created")
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+class ResultStore:
+    """Buffers the tables of a run and writes them in bulk on ``flush``."""
+
+    def __init__(self, tab_dir: Path, db: Path = None, export=EXPORT_FORMATS,
+                 run_id: str = None, data_hash: str = None):
+        self.tab_dir = Path(tab_dir)
+        self.db = Path(db) if db else None
+        self.export = tuple(export)
+        self.run_id = run_id or new_run_id()
+        self.data_hash = data_hash
+        self.writer = None              # optional src.writer.ArtifactWriter for the file exports
+        self._tables = {}               # name -> (table, metadata), in insertion order
+
+    def add(self, name: str, table: pd.DataFrame, skip=(), **meta) -> Path:
+        """Queue ``table`` under ``name``; returns where its CSV export will be (or the store).
+
+        ``skip``: export formats this table is left out of (e.g. "md" for very long tables).
+        """
+        export = tuple(f for f in self.export if f not in skip)
+        self._tables[name] = (table, meta, export)
+        if self.writer is not None and export:
+            self.tab_dir.mkdir(parents=True, exist_ok=True)
+            write_table(table, self.tab_dir, name, formats=export, writer=self.writer)
+        if "csv" in export:
+            return self.tab_dir / f"{name}.csv"
+        return self.db
+
+    def flush(self) -> list:
+        """Write every queued table (store first, then file exports); returns the table names."""
+        names = list(self._tables)
+        if self.db is not None and names:
+            with span(self.db.name, "write"):
+                self._write_db()
+        if self.export and self.writer is None:
+            self.tab_dir.mkdir(parents=True, exist_ok=True)
+            for name, (table, _, export) in self._tables.items():
+                if export:
+                    write_table(table, self.tab_dir, name, formats=export)
+        self._tables = {}
+        return names
+
+    def _write_db(self) -> None:
+        self.db.parent.mkdir(parents=True, exist_ok=True)
+        created = time.strftime("%Y-%m-%dT%H:%M:%S")
+        rows = []
+        con = sqlite3.connect(self.db)
+        try:
+            with con:                  # one transaction for the whole run
+                con.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (name TEXT PRIMARY KEY, step TEXT, "
+                            "kind TEXT, x TEXT, y TEXT, hue TEXT, rows INTEGER, run_id TEXT, "
+                            "data_hash TEXT, created TEXT)")
+                for name, (table, meta, _) in self._tables.items():
+                    table.to_sql(name, con, if_exists="replace", index=False)
+                    rows.append((name, meta.get("step"), meta.get("kind"), meta.get("x"), meta.get("y"),
+                                 meta.get("hue"), len(table), self.run_id, self.data_hash, created))
+                con.executemany(f"INSERT OR REPLACE INTO {META_TABLE} VALUES "
+                                f"({', '.join('?' * len(META_COLUMNS))})", rows)
+        finally:
+            con.close()
+
+
+def read_results(db: Path, name: str = None) -> pd.DataFrame:
+    """The metadata table of ``db``, or the aggregate table ``name``."""
+    con = sqlite3.connect(db)
+    try:
+        return pd.read_sql(f'SELECT * FROM "{name or META_TABLE}"', con)
+    finally:
+        con.close()
+
+
+def export_store(db: Path, tab_dir: Path, formats=EXPORT_FORMATS) -> int:
+    # Re-export every table recorded in the store as files
+    meta = read_results(db)
+    tab_dir = Path(tab_dir)
+    tab_dir.mkdir(parents=True, exist_ok=True)
+    for name in meta["name"]:
+        write_table(read_results(db, name), tab_dir, name, formats=formats)
+    return len(meta)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="export tables from a results store")
+    p.add_argument("db")
+    p.add_argument("--export", default="csv,md")
+    p.add_argument("--out", default="out/tab")
+    args = p.parse_args()
+    print(f"{export_store(args.db, args.out, parse_export(args.export))} tables exported to {args.out}")
@@ -0,0 +1,88 @@
+"""Chunked streaming aggregation for datasets larger than memory.
+
+The CSV is read in chunks; each chunk is reduced to per-group partial state
+(moments, extremes and a quantile sketch per target, see src.summary) and
+merged into the running state, so memory is bounded by the number of groups
+rather than rows. The final tables are those of ``src.aggregate.aggregate``.
+
+Binned requests (src.binning) need their bin edges before the first chunk is
+reduced: edges that depend on the data come from a first pass over the x
+columns only (min/max for equal-width bins, plus a quantile sketch for quantile
+bins, the same edges as in memory).
+"""
+import numpy as np
+
+from src.aggregate import collect
+from src.binning import bin_edges, collect_binned, is_binned, quantile_edges
+from src.cache import is_column_dir, iter_columns
+from src.schema import DECIMALS, iter_typed, to_float64
+from src.summary import STATS, BinnedAggregate, PartialAggregate   # re-exported
+from src.summary import merge_buckets, sketch_buckets
+
+
+def stream_edges(path, binned, chunksize: int = 100_000) -> dict:
+    """{(x, bins): edges} of the binned requests; data-dependent edges take one pass over the x columns.
+
+    The pass keeps the exact min and max of each x column and, for quantile
+    bins, a log-bucket sketch (src.summary), so memory does not grow with the
+    rows; the sketch holds the same counts as one of all the values, so the
+    edges are those of ``bin_edges`` on the whole column.
+    """
+    plan = {(keys[0], bins) for keys, _, bins in binned}
+    edges = {(x, bins): bin_edges(bins, ()) for x, bins in plan if bins.method == "edges"}
+    pending = [(x, bins) for x, bins in plan if (x, bins) not in edges]
+    if not pending:
+        return edges
+    quantiles = {x for x, bins in pending if bins.method == "quantile"}
+    extremes = {}                                   # x -> [min, max]
+    sketches = {x: (np.zeros(0, dtype="int64"), np.zeros(0, dtype="int64")) for x in quantiles}
+    chunks = iter_columns if is_column_dir(path) else iter_typed
+    for chunk in chunks(path, chunksize, usecols={x for x, _ in pending}):
+        for x in {x for x, _ in pending}:
+            v = to_float64(chunk[x]).to_numpy()
+            v = v[np.isfinite(v)]
+            if not len(v):
+                continue
+            lo, hi = extremes.get(x, (np.inf, -np.inf))
+            extremes[x] = (min(lo, v.min()), max(hi, v.max()))
+            if x in quantiles:
+                buckets, counts = np.unique(sketch_buckets(v), return_counts=True)
+                sketches[x] = merge_buckets(np.concatenate([sketches[x][0], buckets]),
+                                            np.concatenate([sketches[x][1], counts]))
+    for x, bins in pending:
+        if x not in extremes:
+            edges[(x, bins)] = bin_edges(bins, ())
+        elif bins.method == "width" or extremes[x][0] == extremes[x][1]:
+            edges[(x, bins)] = bin_edges(bins, extremes[x])         # only the min and max matter
+        else:
+            bin_edges(bins, extremes[x])                            # validates n
+            edges[(x, bins)] = quantile_edges(bins.n, *extremes[x], *sketches[x], DECIMALS.get(x))
+    return edges
+
+
+def stream_partials(path, requests, chunksize: int = 100_000) -> dict:
+    """Fold the CSV (or column directory) chunk by chunk into {keys: PartialAggregate}; only needed columns are read.
+
+    Binned requests get a ``BinnedAggregate`` each, under ``(keys, bins)``.
+    """
+    binned = [r for r in requests if is_binned(r)]
+    plan = collect([r for r in requests if not is_binned(r)])
+    partials = {keys: PartialAggregate(keys, targets) for keys, targets in plan.items()}
+    edges = stream_edges(path, binned, chunksize)
+    for (keys, bins), targets in collect_binned(binned).items():
+        partials[(keys, bins)] = BinnedAggregate(keys, targets, bins, edges[(keys[0], bins)])
+    usecols = {c for agg in partials.values() for c in agg.columns}
+    chunks = iter_columns if is_column_dir(path) else iter_typed
+    for chunk in chunks(path, chunksize, usecols=usecols):
+        for agg in partials.values():
+            agg.update(chunk)
+    return partials
+
+
+def stream_aggregate(path, requests, chunksize: int = 100_000) -> dict:
+    """Streaming counterpart of ``src.aggregate.aggregate``: {(keys, target): table}."""
+    tables = {}
+    for agg in stream_partials(path, requests, chunksize).values():
+        for y, table in agg.tables().items():
+            tables[agg.request(y)] = table
+    return tables
@@ -0,0 +1,283 @@
+"""Mergeable per-group summaries: count, mean, variance, min/max and quantiles.
+
+``PartialAggregate`` reduces rows to a small per-group state in one pass and
+merges states from other chunks (``--stream``), months (``--append``) or
+workers without going back to the rows:
+
+* moments: count, mean and the sum of squared deviations ``m2`` per target,
+  merged with Chan et al.'s parallel update (Welford's algorithm across
+  partitions), so the variance does not suffer the cancellation of sum of
+  squares;
+* exact min and max;
+* approximate quantiles from a log-bucket sketch (as DDSketch): every value
+  falls in a signed bucket ``ceil(log_gamma |x|)`` whose representative is
+  within ``ACCURACY`` (relative) of it; merging adds bucket counts. Quantiles
+  interpolate between order statistics like ``pd.Series.quantile`` and are
+  clipped to the exact min/max.
+
+Every summary table has the key columns, the mean of the target (the value the
+charts draw, under the target's name) and ``SUMMARY_COLUMNS``.
+"""
+import numpy as np
+import pandas as pd
+
+from src.binning import BIN_COLUMN, bin_codes, binned_table
+from src.schema import to_float64
+
+STATS = ("count", "mean", "m2", "min", "max")     # state columns <target>__<stat>
+SUMMARY_COLUMNS = ("count", "std", "var", "sem", "min", "max", "q25", "q50", "q75")
+QUANTILES = {"q25": .25, "q50": .5, "q75": .75}
+ACCURACY = .005                 # relative error of the sketched quantiles
+
+_GAMMA = (1 + ACCURACY) / (1 - ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+_TINY = 1e-9                    # |x| below this falls in the zero bucket
+_OFFSET = int(-np.floor(np.log(_TINY) / _LOG_GAMMA)) + 1    # buckets of |x| >= _TINY are >= 1
+_DENSE_LIMIT = 1 << 24          # largest group x bucket grid counted with one bincount
+
+
+def sketch_buckets(x: np.ndarray) -> np.ndarray:
+    # Signed log bucket of each (finite) value; bucket order is value order
+    a = np.abs(x)
+    with np.errstate(divide="ignore"):
+        b = np.ceil(np.log(np.maximum(a, _TINY)) / _LOG_GAMMA) + _OFFSET
+    return (np.sign(x) * np.where(a >= _TINY, b, 0)).astype(np.int64)
+
+
+def bucket_values(b: np.ndarray) -> np.ndarray:
+    # Representative of each bucket, within ACCURACY of every value in it
+    b = np.asarray(b)
+    return np.sign(b) * np.where(b == 0, 0.0, 2 * _GAMMA ** (np.abs(b) - _OFFSET) / (_GAMMA + 1))
+
+
+def _group_ids(keys) -> np.ndarray:
+    # Dense id of each row's group in sorted group order, as groupby(sort=True, observed=True)
+    # numbers them (cheaper than ngroup's rank for categorical keys); -1 for rows with a missing key
+    ids = np.zeros(len(keys[0]), dtype=np.int64)
+    missing = np.zeros(len(ids), dtype=bool)
+    size = 1
+    for s in keys:
+        codes, uniques = pd.factorize(s, sort=True)
+        missing |= codes < 0
+        ids = ids * len(uniques) + codes
+        size *= len(uniques)
+    ids = ids[~missing]
+    if size <= 4 * len(ids) + 1024:
+        present = np.zeros(size, dtype=bool)
+        present[ids] = True
+        dense = np.cumsum(present) - 1
+        ids = dense[ids]
+    else:
+        ids = np.unique(ids, return_inverse=True)[1].reshape(-1)
+    out = np.full(len(missing), -1, dtype=np.int64)
+    out[~missing] = ids
+    return out
+
+
+def _count_pairs(group: np.ndarray, bucket: np.ndarray, n_groups: int):
+    # Occupied (group, bucket) pairs and their counts, in group then bucket order
+    if not len(group):
+        return group, bucket, np.zeros(0, dtype="int64")
+    lo = bucket.min()
+    width = int(bucket.max() - lo) + 1
+    if n_groups * width <= _DENSE_LIMIT:
+        counts = np.bincount(group * width + (bucket - lo), minlength=n_groups * width)
+        cells = np.flatnonzero(counts)
+        return cells // width, cells % width + lo, counts[cells]
+    cells, counts = np.unique(np.column_stack([group, bucket]), axis=0, return_counts=True)
+    return cells[:, 0], cells[:, 1], counts
+
+
+def merge_buckets(buckets: np.ndarray, counts: np.ndarray):
+    # Sum the counts of equal buckets: (sorted buckets, counts)
+    buckets, inverse = np.unique(buckets, return_inverse=True)
+    return buckets, np.bincount(inverse.reshape(-1), weights=counts, minlength=len(buckets)).astype("int64")
+
+
+def sketch_quantiles(buckets: np.ndarray, counts: np.ndarray, q) -> np.ndarray:
+    """Quantiles ``q`` of one sketch (sorted ``buckets`` and their ``counts``), interpolated as np.quantile."""
+    values = bucket_values(buckets)
+    cum = np.cumsum(counts)
+    rank = np.asarray(q, dtype="float64") * (cum[-1] - 1)
+    below, above = np.floor(rank), np.ceil(rank)
+    lo = values[np.searchsorted(cum, below, side="right")]
+    hi = values[np.searchsorted(cum, above, side="right")]
+    return lo + (hi - lo) * (rank - below)
+
+
+def _quantiles(sketch: pd.DataFrame, keys) -> pd.DataFrame:
+    # Quantiles of every group of a (sorted) sketch: the key columns followed by QUANTILES
+    gid = sketch.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    counts = sketch["count"].to_numpy()
+    values = bucket_values(sketch["bucket"].to_numpy())
+    cum = np.cumsum(counts)
+    total = np.bincount(gid, weights=counts).astype("int64")
+    offset = np.concatenate([[0], np.cumsum(total)[:-1]])
+    first = np.flatnonzero(np.r_[True, gid[1:] != gid[:-1]])
+    out = sketch.iloc[first][list(keys)].reset_index(drop=True)
+    for name, q in QUANTILES.items():
+        rank = q * (total - 1)
+        below, above = np.floor(rank), np.ceil(rank)
+        lo = values[np.searchsorted(cum, offset + below, side="right")]
+        hi = values[np.searchsorted(cum, offset + above, side="right")]
+        out[name] = lo + (hi - lo) * (rank - below)
+    return out
+
+
+class PartialAggregate:
+    """Mergeable per-group summaries of several targets for one key set.
+
+    ``state`` has the key columns followed by one ``<target>__<stat>`` column per
+    target and statistic (STATS); ``sketches`` maps each target to its quantile
+    sketch: the key columns, ``bucket`` and ``count``, one row per occupied
+    bucket of a group.
+    """
+
+    def __init__(self, keys, targets, state: pd.DataFrame = None, sketches: dict = None):
+        self.keys = tuple(keys)
+        self.targets = list(targets)
+        self.state = state
+        self.sketches = sketches or {}
+
+    @property
+    def columns(self) -> tuple:
+        # Dataset columns a chunk must have
+        return (*self.keys, *self.targets)
+
+    def request(self, target) -> tuple:
+        # The request a table of ``tables`` answers
+        return (self.keys, target)
+
+    # ---- reduce and merge --------------------------------------------------------------------
+
+    def partial(self, chunk: pd.DataFrame):
+        # Reduce one chunk to its per-group (state, sketches)
+        values = pd.DataFrame({y: to_float64(chunk[y]) for y in self.targets})
+        by = [chunk[k] for k in self.keys]
+        g = values.groupby(by, observed=True)
+        stats = g.agg(["count", "mean", "var", "min", "max"])
+        groups = stats.index.to_frame(index=False)
+        state = groups.copy()
+        for y in self.targets:
+            n = stats[(y, "count")].to_numpy()
+            state[f"{y}__count"] = n
+            state[f"{y}__mean"] = stats[(y, "mean")].to_numpy()
+            state[f"{y}__m2"] = np.where(n > 1, stats[(y, "var")].to_numpy() * (n - 1), 0.0)
+            state[f"{y}__min"] = stats[(y, "min")].to_numpy()
+            state[f"{y}__max"] = stats[(y, "max")].to_numpy()
+        gid = _group_ids(by)
+        sketches = {}
+        for y in self.targets:
+            x = values[y].to_numpy()
+            ok = np.isfinite(x) & (gid >= 0)
+            group, bucket, counts = _count_pairs(gid[ok], sketch_buckets(x[ok]), len(groups))
+            sketch = groups.iloc[group].reset_index(drop=True)
+            sketch["bucket"] = bucket
+            sketch["count"] = counts
+            sketches[y] = sketch
+        return state, sketches
+
+    def update(self, chunk: pd.DataFrame) -> "PartialAggregate":
+        state, sketches = self.partial(chunk)
+        return self._absorb(state, sketches)
+
+    def merge(self, other: "PartialAggregate") -> "PartialAggregate":
+        if other.state is not None:
+            self._absorb(other.state, other.sketches)
+        return self
+
+    def _absorb(self, state: pd.DataFrame, sketches: dict) -> "PartialAggregate":
+        if self.state is None:
+            self.state, self.sketches = state, dict(sketches)
+            return self
+        self.state = self._merge_states(self.state, state)
+        keys = [*self.keys, "bucket"]
+        for y, sketch in sketches.items():
+            both = pd.concat([self.sketches[y], sketch], ignore_index=True)
+            self.sketches[y] = both.groupby(keys, observed=True, sort=True)["count"].sum().reset_index()
+        return self
+
+    def _merge_states(self, a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+        # Chan et al.: n = sum n_i, mean = sum n_i mean_i / n, m2 = sum m2_i + n_i (mean_i - mean)^2
+        both = pd.concat([a, b], ignore_index=True)
+        g = both.groupby(list(self.keys), observed=True, sort=True)
+        gid = g.ngroup().to_numpy()
+        extremes = g.agg({f"{y}__{s}": s for y in self.targets for s in ("min", "max")})
+        merged = extremes.index.to_frame(index=False)
+        size = len(merged)
+        for y in self.targets:
+            n = both[f"{y}__count"].to_numpy()
+            mean = np.where(n > 0, both[f"{y}__mean"].to_numpy(), 0.0)
+            total = np.bincount(gid, weights=n, minlength=size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                new_mean = np.bincount(gid, weights=n * mean, minlength=size) / total
+            dev = np.where(n > 0, n * (mean - new_mean[gid]) ** 2, 0.0)
+            merged[f"{y}__count"] = total.astype("int64")
+            merged[f"{y}__mean"] = np.where(total > 0, new_mean, np.nan)
+            merged[f"{y}__m2"] = np.bincount(gid, weights=both[f"{y}__m2"].to_numpy() + dev, minlength=size)
+            merged[f"{y}__min"] = extremes[f"{y}__min"].to_numpy()
+            merged[f"{y}__max"] = extremes[f"{y}__max"].to_numpy()
+        return merged
+
+    # ---- results -----------------------------------------------------------------------------
+
+    def summary(self, target) -> pd.DataFrame:
+        """The key columns, the mean of ``target`` under its own name, then SUMMARY_COLUMNS."""
+        keys = list(self.keys)
+        s = self.state
+        n = s[f"{target}__count"].to_numpy()
+        table = s[keys].copy()
+        table[target] = s[f"{target}__mean"].to_numpy()
+        table["count"] = n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(n > 1, s[f"{target}__m2"].to_numpy() / (n - 1), np.nan)
+            table["std"] = np.sqrt(var)
+            table["var"] = var
+            table["sem"] = table["std"] / np.sqrt(n)
+        table["min"] = s[f"{target}__min"].to_numpy()
+        table["max"] = s[f"{target}__max"].to_numpy()
+        sketch = self.sketches.get(target)
+        if sketch is not None and len(sketch):
+            q = table[keys].merge(_quantiles(sketch, keys), on=keys, how="left")
+            for name in QUANTILES:
+                table[name] = np.clip(q[name].to_numpy(), table["min"], table["max"])
+        else:
+            for name in QUANTILES:
+                table[name] = np.nan
+        return table
+
+    def tables(self) -> dict:
+        """{target: summary table}; the same tables as ``src.aggregate.aggregate``."""
+        return {y: self.summary(y) for y in self.targets}
+
+
+class BinnedAggregate(PartialAggregate):
+    """``PartialAggregate`` over the bins of the first key (fixed ``edges``) and the other keys.
+
+    The state is kept per (bin, other keys) group, with the x column itself as
+    an extra target so each table can report the mean x of its groups.
+    """
+
+    def __init__(self, keys, targets, bins, edges, state: pd.DataFrame = None, sketches: dict = None):
+        self.binned_keys = tuple(keys)
+        self.bins = bins
+        self.edges = np.asarray(edges, dtype="float64")
+        self.requested = list(targets)
+        super().__init__((BIN_COLUMN, *keys[1:]), list(dict.fromkeys([keys[0], *targets])), state, sketches)
+
+    @property
+    def columns(self) -> tuple:
+        return (*self.binned_keys, *self.targets)
+
+    def request(self, target) -> tuple:
+        return (self.binned_keys, target, self.bins)
+
+    def partial(self, chunk: pd.DataFrame):
+        codes = bin_codes(to_float64(chunk[self.binned_keys[0]]).to_numpy(), self.edges)
+        return super().partial(chunk.assign(**{BIN_COLUMN: codes}))
+
+    def tables(self) -> dict:
+        """{target: binned table} (see src.binning)."""
+        x_mean = self.state[f"{self.binned_keys[0]}__mean"]
+        return {y: binned_table(self.binned_keys, y, self.summary(y), x_mean, self.edges)
+                for y in self.requested}
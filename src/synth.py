@@ -0,0 +1,205 @@
+"""Synthetic fitness panel with the exact schema of data/set.csv.
+
+    python -m src.synth --subjects 100000 --months 24 --seed 1 --out data/synth.csv
+    python -m src.synth --subjects 1000000 --format npy --out data/synth   # column directory
+
+Subjects have fixed traits (sex, age, height, smoker, fitness, habits); every
+month adds noise and a slow weight drift, and the metrics are derived from
+those with the directions seen in the real data (BMI and body fat, VO2max
+against age, body fat and smoking, 5 km time against VO2max, lipids against
+smoking and alcohol, strength against sex and training, ...).
+
+Rows are produced in seeded blocks of ``BLOCK`` subjects and written as they
+are generated, so memory stays flat at any size and the output for a given
+seed does not depend on ``--chunk-subjects``. ``--format npy`` writes the
+column directory of ``src.cache`` directly, which ``load_dataset`` (and
+``Pipeline.py --data``) read like a CSV.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import CACHE_VERSION
+from src.schema import DECIMALS, SCHEMA, SEX_CATEGORIES
+
+COLUMNS = list(SCHEMA)
+BLOCK = 1000                      # subjects per seeded block
+
+
+def _block(seed: int, index: int, first_id: int, n: int, months: pd.PeriodIndex) -> dict:
+    """Columns (float64/int64 arrays, subject-major order) for subjects first_id .. first_id+n-1."""
+    rng = np.random.default_rng([seed, index])
+    m = len(months)
+    normal = lambda loc=0.0, scale=1.0: rng.normal(loc, scale, (n, m))
+    per_subject = lambda a: np.repeat(np.asarray(a)[:, None], m, axis=1)
+
+    # Fixed traits
+    male = rng.random(n) < 0.476
+    age = rng.integers(18, 66, n)
+    height = np.where(male, 175.2, 162.5) + rng.normal(0, 6.5, n)
+    smoker = (rng.random(n) < 0.212).astype(int)
+    fitness = rng.normal(0, 1, n)
+    workouts = np.clip(np.rint(3.25 + 1.4 * fitness + rng.normal(0, .8, n)), 0, 10)
+    base_bmi = 24.5 + 1.2 * (age - 40) / 14 - 1.0 * fitness + rng.normal(0, 3.2, n)
+    base_weight = base_bmi * (height / 100) ** 2
+    base_sleep = np.clip(rng.normal(7.05, .98, n), 4.3, 9.3)
+    base_stress = rng.normal(4.1, .35, n) - .25 * (base_sleep - 7)
+    base_alcohol = rng.gamma(1.7, 2.4, n)
+
+    # Monthly values: traits plus noise; weight drifts slowly
+    male_m, age_m, smoker_m, workouts_m = map(per_subject, (male, age, smoker, workouts))
+    height_m = per_subject(height)
+    weight = per_subject(base_weight) + np.cumsum(normal(0, .45), axis=1)
+    bmi = weight / (height_m / 100) ** 2
+    steps = 9700 + 1300 * per_subject(fitness) + 250 * (workouts_m - 3.25) + normal(0, 1250)
+    sleep = np.clip(per_subject(base_sleep) + normal(0, .34), 4, 9.5)
+    stress = np.clip(per_subject(base_stress) + normal(0, .75) - .3 * (sleep - 7), 1, 10)
+    alcohol = np.clip(per_subject(base_alcohol) + normal(0, 1.4), 0, None)
+    body_fat = np.where(male_m, 23.0, 32.9) + 1.1 * (bmi - 24.5) + .1 * (age_m - 40) \
+        - 1.2 * (workouts_m - 3.25) + normal(0, 2.8)
+    body_fat = np.clip(body_fat, 4, 60)
+    vo2max = 41.4 + np.where(male_m, 3.2, -3.2) - .25 * (age_m - 40) - .35 * (body_fat - 28) \
+        + 1.5 * (workouts_m - 3.25) + .0003 * (steps - 9700) - 2.5 * smoker_m + .8 * (sleep - 7) \
+        + normal(0, 2.9)
+    vo2max = np.clip(vo2max, 15, 75)
+    run_5k = np.clip(25.75 - .6 * (vo2max - 41.4) + normal(0, 1.5), 14, 50)
+    resting_hr = 70 - .5 * (vo2max - 41.4) + 7 * smoker_m - 1.5 + 1.5 * (stress - 4.1) \
+        - 1.5 * (sleep - 7) + normal(0, 3.5)
+    systolic = 155.7 + .65 * (age_m - 40) + 1.2 * (bmi - 24.5) + 5 * smoker_m + normal(0, 7)
+    diastolic = 96.5 + .35 * (age_m - 40) + .6 * (bmi - 24.5) + 3 * smoker_m + normal(0, 5)
+    sex_weight = np.where(male_m, 77.6, 63.1)
+    bench = np.where(male_m, 102.8, 66.5) + .8 * (weight - sex_weight) + 6 * (workouts_m - 3.25) \
+        + normal(0, 10)
+    squat = np.where(male_m, 160.6, 108.8) + 1.2 * (weight - sex_weight) + 9 * (workouts_m - 3.25) \
+        + normal(0, 15)
+    pushups = np.where(male_m, 34.3, 20.0) + 5 * (workouts_m - 3.25) - .4 * (body_fat - 28) + normal(0, 6)
+    calories = np.where(male_m, 1897, 1543) + 18 * (weight - sex_weight) + 60 * (workouts_m - 3.25) \
+        + normal(0, 200)
+    calories = np.clip(calories, 1200, None)
+    protein = 96 + .05 * (calories - 1711) + 8 * (workouts_m - 3.25) + normal(0, 15)
+    ldl = 125 + 8 * (smoker_m - .21) + .4 * (body_fat - 28) - .3 * (vo2max - 41.4) + .4 * (alcohol - 4) \
+        + normal(0, 6)
+    hdl = np.where(male_m, 44.2, 38.0) - .4 * (body_fat - 28) + .15 * (vo2max - 41.4) - 4 * smoker_m \
+        + normal(0, 5)
+    triglycerides = 115 + 2.5 * (alcohol - 4) + 10 * smoker_m + .5 * (bmi - 24.5) + normal(0, 18)
+
+    values = {
+        "id": per_subject(np.arange(first_id, first_id + n)),
+        "month": np.tile(months.asi8, (n, 1)),
+        "age": age_m, "sex": male_m.astype(int), "height_cm": height_m, "weight_kg": weight,
+        "bmi": bmi, "body_fat_pct": body_fat, "weekly_workouts": workouts_m,
+        "steps_per_day": np.clip(steps, 2000, None), "sleep_hours": sleep, "stress_level": stress,
+        "calorie_intake": calories, "protein_g": np.clip(protein, 35, None),
+        "alcohol_units_per_week": alcohol, "smoker": smoker_m, "vo2max": vo2max, "run_5k_min": run_5k,
+        "resting_hr": np.clip(resting_hr, 40, None), "systolic_bp": systolic, "diastolic_bp": diastolic,
+        "bench_1rm_kg": np.clip(bench, 20, None), "squat_1rm_kg": np.clip(squat, 30, None),
+        "max_pushups": np.clip(pushups, 0, None), "ldl_mg_dL": ldl,
+        "hdl_mg_dL": np.clip(hdl, 20, None), "triglycerides_mg_dL": np.clip(triglycerides, 40, None),
+    }
+    out = {}
+    for col, v in values.items():
+        v = np.asarray(v).reshape(-1)
+        out[col] = np.round(v, DECIMALS[col]) if col in DECIMALS else np.rint(v).astype("int64")
+    return out
+
+
+def generate(subjects: int, months: int, seed: int = 0, start: str = "2024-01",
+             chunk_subjects: int = 10 * BLOCK):
+    """Yield the panel as dicts of columns, ``chunk_subjects`` subjects (x ``months`` rows) at a time."""
+    periods = pd.period_range(start, periods=months, freq="M")
+    per_chunk = max(1, chunk_subjects // BLOCK)
+    blocks = range(0, subjects, BLOCK)
+    for i in range(0, len(blocks), per_chunk):
+        parts = [_block(seed, b // BLOCK, b + 1, min(BLOCK, subjects - b), periods)
+                 for b in blocks[i:i + per_chunk]]
+        yield {col: np.concatenate([p[col] for p in parts]) for col in COLUMNS}
+
+
+def write_csv(path: Path, chunks) -> int:
+    rows = 0
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as fh:
+            for columns in chunks:
+                frame = pd.DataFrame({c: columns[c] for c in COLUMNS})
+                frame["month"] = pd.PeriodIndex.from_ordinals(frame["month"], freq="M").astype(str)
+                frame["sex"] = np.asarray(SEX_CATEGORIES, dtype=object)[frame["sex"]]
+                frame.to_csv(fh, header=rows == 0, index=False)
+                rows += len(frame)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return rows
+
+
+def write_npy(path: Path, chunks, total: int) -> int:
+    """Fill preallocated memory-mapped columns chunk by chunk (a ``src.cache`` column directory)."""
+    path = Path(path)
+    tmp = Path(tempfile.mkdtemp(dir=path.parent, prefix=".synth-"))
+    try:
+        meta, arrays = [], {}
+        for i, col in enumerate(COLUMNS):
+            fname = f"{i:03d}.npy"
+            if col == "month":
+                dtype, info = "int64", {"kind": "period", "dtype": str(SCHEMA[col])}
+            elif col == "sex":
+                dtype, info = "int8", {"kind": "category", "categories": SEX_CATEGORIES, "ordered": False}
+            else:
+                dtype, info = SCHEMA[col], {"kind": "numeric"}
+            arrays[col] = np.lib.format.open_memmap(tmp / fname, mode="w+", dtype=dtype, shape=(total,))
+            meta.append({"name": col, "file": fname, **info})
+        rows = 0
+        for columns in chunks:
+            n = len(columns["id"])
+            for col, arr in arrays.items():
+                arr[rows:rows + n] = columns[col]
+            rows += n
+        for arr in arrays.values():
+            arr.flush()
+        del arrays
+        (tmp / "meta.json").write_text(json.dumps({"version": CACHE_VERSION, "rows": rows, "columns": meta},
+                                                  indent=1))
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(description="generate a synthetic panel with the schema of data/set.csv")
+    p.add_argument("--subjects", type=int, default=1000)
+    p.add_argument("--months", type=int, default=12)
+    p.add_argument("--start", default="2024-01", help="first month (YYYY-MM)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--format", choices=("csv", "npy"), default="csv",
+                   help="csv, or npy: a column directory that load_dataset reads directly")
+    p.add_argument("--chunk-subjects", type=int, default=10 * BLOCK,
+                   help="subjects generated and written per chunk (memory use; not the output)")
+    p.add_argument("--out", required=True)
+    args = p.parse_args()
+    if args.subjects < 1 or args.months < 1 or args.chunk_subjects < 1:
+        p.error("--subjects, --months and --chunk-subjects must be >= 1")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    chunks = generate(args.subjects, args.months, args.seed, args.start, args.chunk_subjects)
+    if args.format == "csv":
+        rows = write_csv(out, chunks)
+    else:
+        rows = write_npy(out, chunks, args.subjects * args.months)
+    print(f">>> {rows} rows ({args.subjects} subjects x {args.months} months) written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Figure templates: build a chart skeleton once, then only swap its data.
+
+``sns.lmplot`` and ``plt.subplots`` + ``sns.barplot`` create a new figure,
+axes, artists and layout for every chart, and ``bbox_inches="tight"`` costs an
+extra draw on save. For the two standard chart shapes of the steps (regression
+faceted by its hue column, grouped bars) a template keeps one figure per shape
+alive in each render process (outside pyplot, so ``plt.close`` cannot reach
+it) and, per chart, only replaces the artist data, colours, labels and
+limits before saving with a fixed layout.
+
+``render_template(job)`` returns ``None`` for jobs no template covers (other
+shapes, seaborn's bootstrap bands, heatmaps); the caller then falls back to
+the seaborn renderer.
+"""
+import numpy as np
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from src.stats import ols_band
+
+_TEMPLATES = {}                    # per-process cache: shape key -> template
+
+
+def _levels(values) -> list:
+    # Category order when the column has one, otherwise sorted unique values (as seaborn does)
+    cats = getattr(values, "cat", None)
+    if cats is not None:
+        return [c for c in cats.categories if (values == c).any()]
+    return sorted(values.unique())
+
+
+def _padded(lo, hi, margin=.05):
+    span = (hi - lo) or 1.0
+    return lo - margin * span, hi + margin * span
+
+
+class LmTemplate:
+    """One regression panel per facet; each panel shows the facet's own hue level."""
+
+    def __init__(self, facets, col):
+        n = len(facets)
+        self.fig = Figure(figsize=(5 * n, 5))
+        axes = self.fig.subplots(1, n, sharex=True, sharey=True, squeeze=False)
+        self.axes = list(axes[0])
+        self.artists = []
+        for ax, facet in zip(self.axes, facets):
+            ax.set_title(f"{col} = {facet}", fontsize="medium")
+            scatter = ax.scatter([], [], s=36, alpha=.8)
+            line, = ax.plot([], [], linewidth=2.25)
+            band = ax.fill_between([0, 1], [0, 0], [0, 0], alpha=.15, linewidth=0)
+            self.artists.append((scatter, line, band))
+            sns.despine(ax=ax)
+        self.fig.subplots_adjust(left=.08, right=.97, bottom=.12, top=.85, wspace=.08)
+
+    def update(self, job, facets):
+        table, x, y = job["table"], job["x"], job["y"]
+        ci = job["ci"]
+        colors = sns.color_palette(job["palette"], len(facets))
+        xs, ys = [], []
+        for (scatter, line, band), facet, color in zip(self.artists, facets, colors):
+            part = table[table[job["col"]] == facet]
+            px = part[x].to_numpy(dtype="float64")
+            py = part[y].to_numpy(dtype="float64")
+            scatter.set_offsets(np.column_stack([px, py]))
+            scatter.set_facecolor(color)
+            scatter.set_edgecolor(color)
+            grid = np.linspace(px.min(), px.max(), 100) if len(px) else np.array([])
+            fit, lower, upper = ols_band(px, py, grid, ci["level"]) if len(px) else (grid, grid, grid)
+            line.set_data(grid, fit)
+            line.set_color(color)
+            show_band = ci["method"] == "analytic" and len(grid) and np.isfinite(lower).all()
+            band.set_visible(bool(show_band))
+            if show_band:
+                band.set_verts([np.concatenate([np.column_stack([grid, lower]),
+                                                np.column_stack([grid[::-1], upper[::-1]])])])
+                band.set_facecolor(color)
+                ys += [lower, upper]
+            xs.append(px)
+            ys.append(py)
+        xs = np.concatenate(xs)
+        ys = np.concatenate([v[np.isfinite(v)] for v in ys])
+        if len(xs):
+            self.axes[0].set_xlim(*_padded(xs.min(), xs.max()))
+            self.axes[0].set_ylim(*_padded(ys.min(), ys.max()))
+        for ax in self.axes:
+            ax.set_xlabel(x)
+        self.axes[0].set_ylabel(y)
+        self.fig.suptitle(job["title"])
+
+
+class BarTemplate:
+    """Grouped bars: one bar per (x level, hue level), x levels on the axis, hue in the legend."""
+
+    def __init__(self, x_levels, hue_levels, hue):
+        self.fig = Figure(figsize=(6, 4))
+        self.ax = self.fig.subplots()
+        nx, nh = len(x_levels), len(hue_levels)
+        width = .8 / nh
+        pos = np.arange(nx)
+        self.bars = [self.ax.bar(pos - .4 + width * (i + .5), np.zeros(nx), width, label=str(h))
+                     for i, h in enumerate(hue_levels)]
+        self.ax.set_xticks(pos, [str(v) for v in x_levels])
+        self.ax.set_xlim(-.5, nx - .5)
+        self.legend = self.ax.legend(title=hue)
+        self.fig.subplots_adjust(left=.11, right=.97, bottom=.13, top=.91)
+
+    def update(self, job, x_levels, hue_levels):
+        table = job["table"]
+        # Same muted fill as seaborn's bars (saturation .75)
+        colors = [sns.desaturate(c, .75) for c in sns.color_palette(job["palette"], len(hue_levels))]
+        heights = table.set_index([job["x"], job["hue"]])[job["y"]]
+        values = []
+        for bars, handle, h, color in zip(self.bars, self.legend.legend_handles, hue_levels, colors):
+            for bar, xv in zip(bars, x_levels):
+                v = heights.get((xv, h), np.nan)
+                bar.set_height(0 if np.isnan(v) else v)
+                bar.set_facecolor(color)
+                values.append(v)
+            handle.set_facecolor(color)
+        values = np.array(values, dtype="float64")
+        lo = min(0.0, np.nanmin(values)) if np.isfinite(values).any() else 0.0
+        hi = max(0.0, np.nanmax(values)) if np.isfinite(values).any() else 1.0
+        self.ax.set_ylim(lo * 1.05, (hi * 1.05) or 1.0)
+        self.ax.set_xlabel(job["x"])
+        self.ax.set_ylabel(job["y"])
+        self.ax.set_title(job["title"])
+
+
+def render_template(job, save):
+    """Render ``job`` on a cached template and save it with ``save(fig, job)``; None if unsupported."""
+    table = job["table"]
+    if job["kind"] == "lm" and job["hue"] == job["col"] and job["ci"]["method"] != "bootstrap":
+        facets = _levels(table[job["col"]])
+        key = ("lm", job["col"], tuple(facets))
+        if key not in _TEMPLATES:
+            _TEMPLATES[key] = LmTemplate(facets, job["col"])
+        template = _TEMPLATES[key]
+        template.update(job, facets)
+    elif job["kind"] == "bar":
+        x_levels = _levels(table[job["x"]])
+        hue_levels = _levels(table[job["hue"]])
+        key = ("bar", job["hue"], tuple(x_levels), tuple(hue_levels))
+        if key not in _TEMPLATES:
+            _TEMPLATES[key] = BarTemplate(x_levels, hue_levels, job["hue"])
+        template = _TEMPLATES[key]
+        template.update(job, x_levels, hue_levels)
+    else:
+        return None
+    save(template.fig, job, tight=False)
+    return job["path"]
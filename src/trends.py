@@ -0,0 +1,180 @@
+"""Change over time per subject: monthly deltas, slopes, rolling means, best and worst months.
+
+Every statistic is computed for all subjects at once on the subjects x months
+matrix of a metric (``Panel.metric``), one metric at a time:
+
+* ``first``/``last``: the first and last observed value, ``change`` = last - first;
+* month-over-month deltas between consecutive observed months: their mean,
+  smallest and largest (``delta_mean``, ``delta_min``, ``delta_max``);
+* ``slope``: least-squares slope of the value against the month index, in
+  units per month, from masked sums (no per-subject fit);
+* trailing rolling means over ``window`` months from cumulative sums (as
+  ``rolling(window).mean()`` with ``min_periods`` observed months);
+  ``roll_first``/``roll_last`` are the first and last defined ones;
+* ``best``/``worst`` month and value, where lower is better for the metrics in
+  ``lower``; ``improved`` is 1 when the slope points the better way.
+
+``trend_tables`` returns the per-subject table (one row per subject and
+metric), the cohort summaries of those statistics (src.summary) and the
+cohort mean per month of the value, its rolling mean and its delta.
+"""
+import numpy as np
+import pandas as pd
+
+from src.summary import PartialAggregate
+
+SUBJECT_STATS = ("months", "first", "last", "change", "delta_mean", "delta_min", "delta_max", "slope",
+                 "roll_first", "roll_last", "roll_change", "best", "worst", "improved")
+COHORT_STATS = ("slope", "change", "delta_mean", "roll_change", "improved")
+BLOCK_ROWS = 8192               # subjects per block: the temporaries of a block stay in cache
+
+
+def _ends(x: np.ndarray, present: np.ndarray):
+    # Index of the first and last True of each row, and whether the row has any
+    t = x.shape[1]
+    any_ = present.any(1)
+    first = present.argmax(1)
+    last = t - 1 - present[:, ::-1].argmax(1)
+    return first, last, any_
+
+
+def _take(x: np.ndarray, idx: np.ndarray, ok: np.ndarray) -> np.ndarray:
+    return np.where(ok, x[np.arange(len(x)), idx], np.nan)
+
+
+def rolling_means(x: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """Trailing mean over ``window`` months of every row of ``x`` (NaN: missing); NaN below ``min_periods``."""
+    min_periods = window if min_periods is None else min_periods
+    present = np.isfinite(x)
+    sums = np.cumsum(np.where(present, x, 0.0), axis=1)
+    counts = np.cumsum(present, axis=1, dtype=np.int32)
+    sums[:, window:] -= sums[:, :-window].copy()          # window sums from running sums, no gather
+    counts[:, window:] -= counts[:, :-window].copy()
+    return np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts >= max(min_periods, 1))
+
+
+def metric_trends(x: np.ndarray, window: int = 3, min_periods: int = None, lower: bool = False) -> dict:
+    """SUBJECT_STATS (best/worst month positions as ``best_at``/``worst_at``) of each row of ``x``.
+
+    ``x`` is a subjects x months matrix with NaN for missing months; ``lower``:
+    lower values are better. Also returns ``x`` as float64, the rolling means
+    and the deltas under ``values``, ``rolling`` and ``deltas`` for the per-month tables.
+    """
+    x = np.asarray(x, dtype="float64")
+    present = np.isfinite(x)
+    n = present.sum(1)
+    first_at, last_at, any_ = _ends(x, present)
+    out = {"months": n, "first": _take(x, first_at, any_), "last": _take(x, last_at, any_)}
+    out["change"] = out["last"] - out["first"]
+
+    deltas = np.diff(x, axis=1)                 # NaN unless both months are observed
+    ok = np.isfinite(deltas)
+    m = ok.sum(1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["delta_mean"] = np.add.reduce(deltas, axis=1, where=ok) / np.where(m > 0, m, np.nan)
+    out["delta_min"] = np.fmin.reduce(deltas, axis=1)      # fmin/fmax skip NaNs: NaN only when all are
+    out["delta_max"] = np.fmax.reduce(deltas, axis=1)
+
+    # OLS slope from masked sums: (n*sum(ty) - sum(t)*sum(y)) / (n*sum(t^2) - sum(t)^2)
+    t = np.arange(x.shape[1], dtype="float64")
+    y = np.where(present, x, 0.0)
+    w = present.astype("float64")
+    st, stt = w @ t, w @ (t * t)
+    sy, sty = y.sum(1), y @ t
+    denom = n * stt - st * st
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["slope"] = np.where((n > 1) & (denom > 0), (n * sty - st * sy) / denom, np.nan)
+
+    rolling = rolling_means(x, window, min_periods)
+    defined = np.isfinite(rolling)
+    r_first, r_last, r_any = _ends(rolling, defined)
+    out["roll_first"] = _take(rolling, r_first, r_any)
+    out["roll_last"] = _take(rolling, r_last, r_any)
+    out["roll_change"] = out["roll_last"] - out["roll_first"]
+
+    sign = -1.0 if lower else 1.0
+    scored = np.where(present, sign * x, -np.inf)
+    best_at = scored.argmax(1)
+    scored[~present] = np.inf
+    worst_at = scored.argmin(1)
+    out["best"], out["best_at"] = _take(x, best_at, any_), best_at
+    out["worst"], out["worst_at"] = _take(x, worst_at, any_), worst_at
+    out["improved"] = np.where(np.isfinite(out["slope"]), (sign * out["slope"] > 0).astype("float64"), np.nan)
+    out["values"], out["rolling"], out["deltas"] = x, rolling, deltas
+    return out
+
+
+def _cohort_sums(onehot: np.ndarray, x: np.ndarray) -> np.ndarray:
+    # Per cohort (rows of `onehot`, cohorts x subjects) and month: number and sum of the finite values
+    ok = np.isfinite(x)
+    return np.stack([onehot @ ok.astype("float64"), onehot @ np.where(ok, x, 0.0)])
+
+
+def trend_tables(panel, metrics, lower=(), by=("sex", "smoker"), window: int = 3, min_periods: int = None,
+                 block_rows: int = BLOCK_ROWS):
+    """(subjects, cohorts, monthly) trend tables of ``metrics`` for every subject of ``panel``.
+
+    ``subjects``: id, the ``by`` columns, metric, SUBJECT_STATS and the best and
+    worst months; ``cohorts``: the ``by`` columns, metric, the summarized
+    statistic (COHORT_STATS), its mean and the summary columns of src.summary;
+    ``monthly``: per cohort, metric and month, the number of subjects
+    observed, the mean value, mean rolling mean and mean month-over-month delta.
+    Subjects are processed ``block_rows`` at a time.
+    """
+    by = list(by)
+    metrics = list(metrics)
+    subjects = panel.subjects
+    labels = np.asarray(panel.months.astype(str))
+    cohorts = subjects[by].drop_duplicates().sort_values(by).reset_index(drop=True)
+    codes = subjects[by].merge(cohorts.reset_index(), on=by, how="left")["index"].to_numpy()
+    onehot = (codes == np.arange(len(cohorts))[:, None]).astype("float64")
+    n_months = len(labels)
+
+    parts, monthly = [], []
+    for name in metrics:
+        x = panel.metric(name)
+        stats = {s: [] for s in (*SUBJECT_STATS, "best_at", "worst_at")}
+        sums = np.zeros((3, 2, len(cohorts), n_months))     # value, rolling, delta x (count, sum)
+        for start in range(0, len(x), block_rows):
+            block = slice(start, start + block_rows)
+            res = metric_trends(x[block], window, min_periods, lower=name in lower)
+            for s, v in stats.items():
+                v.append(res[s])
+            sums[0] += _cohort_sums(onehot[:, block], res["values"])
+            sums[1] += _cohort_sums(onehot[:, block], res["rolling"])
+            sums[2, :, :, 1:] += _cohort_sums(onehot[:, block], res["deltas"])   # no delta in the first month
+        stats = {s: np.concatenate(v) if v else np.array([]) for s, v in stats.items()}
+        part = subjects[["id", *by]].copy()
+        part["metric"] = name
+        for s in SUBJECT_STATS:
+            part[s] = stats[s]
+        has = stats["months"] > 0
+        part["best_month"] = np.where(has, labels[stats["best_at"].astype(np.intp)], None)
+        part["worst_month"] = np.where(has, labels[stats["worst_at"].astype(np.intp)], None)
+        parts.append(part)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums[:, 1] / sums[:, 0]
+        grid = cohorts.loc[np.repeat(np.arange(len(cohorts)), n_months)].reset_index(drop=True)
+        grid["metric"] = name
+        grid["month"] = np.tile(labels, len(cohorts))
+        grid["subjects"] = sums[0, 0].ravel().astype("int64")
+        grid["value"] = means[0].ravel()
+        grid["rolling"] = means[1].ravel()
+        grid["delta"] = means[2].ravel()
+        monthly.append(grid)
+
+    columns = ["id", *by, "metric", *SUBJECT_STATS, "best_month", "worst_month"]
+    per_subject = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+    per_month = pd.concat(monthly, ignore_index=True) if monthly else pd.DataFrame(
+        columns=[*by, "metric", "month", "subjects", "value", "rolling", "delta"])
+
+    summary = PartialAggregate((*by, "metric"), COHORT_STATS).update(per_subject) if len(per_subject) else None
+    tables = []
+    for s in COHORT_STATS if summary is not None else ():
+        table = summary.summary(s).rename(columns={s: "mean"})
+        table.insert(len(by) + 1, "statistic", s)
+        tables.append(table)
+    per_cohort = pd.concat(tables, ignore_index=True).sort_values([*by, "metric"], kind="stable") \
+        .reset_index(drop=True) if tables else pd.DataFrame(columns=[*by, "metric", "statistic", "mean"])
+    return per_subject, per_cohort, per_month
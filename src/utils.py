@@ -1,7 +1,91 @@
-import pandas as pd
+from functools import partial
+from importlib.util import find_spec
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-DATA = Path("data/set.csv")
-df = pd.read_csv(DATA)
+from src.profiling import span
+from src.writer import atomic_write
 
+if TYPE_CHECKING:                      # pandas is imported by the loaders, not on import of this module
+    import pandas as pd
 
+ROOT = Path(__file__).resolve().parent.parent   # repository root (works from any CWD)
+DATA = ROOT / "data" / "set.csv"
+
+_LOADED = {}   # (resolved path, mtime_ns, size) -> DataFrame
+
+
+def resolve_data_path(path=DATA) -> Path:
+    # Relative paths are tried against the CWD first, then against the repository root
+    path = Path(path)
+    if not path.is_absolute() and not path.exists() and (ROOT / path).exists():
+        path = ROOT / path
+    return path.resolve()
+
+
+def _read_dataset(path: Path, cache: bool, rebuild: bool) -> "pd.DataFrame":
+    from src.schema import read_typed, fingerprint   # declared compact dtypes
+    if path.is_dir():
+        from src.cache import read_columns             # already a binary column directory
+        return read_columns(path)
+    if not cache:
+        return read_typed(path)
+    from src.cache import load_cached
+    try:
+        return load_cached(path, read_typed, rebuild=rebuild, tag=fingerprint())
+    except OSError:
+        return read_typed(path)        # e.g. read-only data directory: skip the cache
+
+
+def load_dataset(path=DATA, cache: bool = True, rebuild: bool = False) -> "pd.DataFrame":
+    """Read the dataset on first access and memoize it per (path, mtime, size).
+
+    Every caller in the process (the pipeline, the step modules and their
+    ``__main__`` runs) shares the same parsed frame; it is re-read only when
+    the file on disk changes. Treat the returned frame as read-only.
+
+    With ``cache`` the CSV is parsed once into the binary column cache
+    (``src.cache``) and later processes load from there; ``rebuild`` forces
+    the cache entry to be regenerated. ``path`` may also be a column
+    directory (e.g. from ``python -m src.synth --format npy``), which is
+    memory-mapped directly.
+    """
+    path = resolve_data_path(path)
+    st = (path / "meta.json").stat() if path.is_dir() else path.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    if key not in _LOADED or rebuild:
+        # Drop frames parsed from older versions of the same file
+        for old in [k for k in _LOADED if k[0] == key[0]]:
+            del _LOADED[old]
+        _LOADED[key] = _read_dataset(path, cache, rebuild)
+    return _LOADED[key]
+
+
+def __getattr__(name):
+    # Backwards compatible `from src.utils import df`, now resolved lazily
+    if name == "df":
+        return load_dataset()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _timed_write(write, name, path):
+    with span(name, "write"):
+        write(path)
+
+
+def write_table(table: "pd.DataFrame", tab_dir: Path, stem: str, formats=("csv", "md"), writer=None):
+    # Export an aggregate as CSV and/or a Markdown copy (Markdown is best-effort: needs tabulate).
+    # Files are written atomically, on the background `writer` when one is given
+    paths = {}
+    for fmt in formats:
+        if fmt == "md" and find_spec("tabulate") is None:
+            continue
+        path = Path(tab_dir) / f"{stem}.{fmt}"
+        write = partial(_timed_write, partial(table.to_csv if fmt == "csv" else table.to_markdown, index=False),
+                        path.name)
+        if writer is not None:
+            writer.submit(path, write)
+        else:
+            atomic_write(path, write)
+        paths[fmt] = path
+    return paths.get("csv"), paths.get("md")
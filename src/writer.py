@@ -0,0 +1,96 @@
+"""Background artifact writer.
+
+PNG encoding and table exports used to block the step that produced them.
+``ArtifactWriter`` takes finished artifacts as small write tasks on a bounded
+queue and runs them on background threads, so the next chart is computed
+while earlier ones are encoded and written. The bound gives backpressure:
+``submit`` blocks while the queue is full, which caps the memory held by
+pending figures. Every file is written to a temporary name in its target
+directory and renamed into place, so readers never see partial artifacts.
+``close`` waits for all tasks and returns their outcome per owning step.
+"""
+import os
+import queue
+import threading
+import uuid
+from pathlib import Path
+
+from src.profiling import bind
+
+
+def atomic_write(path, write) -> Path:
+    """Call ``write(tmp_path)`` and move the result to ``path`` in one rename."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return path
+
+
+class ArtifactWriter:
+    """Bounded queue of write tasks served by ``threads`` background threads.
+
+    With ``threads=0`` tasks run immediately in the caller (errors still go
+    to ``close`` rather than being raised, as with the threaded writer).
+    """
+
+    def __init__(self, threads: int = 2, maxsize: int = 8):
+        self.owner = None                # label attached to submitted tasks (the running step)
+        self._results = []               # (owner, path, error) in completion order
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=maxsize) if threads > 0 else None
+        self._threads = [threading.Thread(target=self._serve, daemon=True, name=f"artifact-writer-{i}")
+                         for i in range(threads)]
+        for t in self._threads:
+            t.start()
+
+    def _run(self, owner, path, write):
+        try:
+            atomic_write(path, write)
+            error = None
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._results.append((owner, Path(path), error))
+
+    def _serve(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                self._run(*task)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, path, write) -> Path:
+        """Queue ``write(tmp_path)`` for ``path``; blocks while the queue is full."""
+        write = bind(write)              # profiling labels (step, chart) follow the task
+        if self._queue is None:
+            self._run(self.owner, path, write)
+        else:
+            self._queue.put((self.owner, path, write))
+        return Path(path)
+
+    def close(self) -> list:
+        # Wait for every pending task and stop the threads; returns [(owner, path, error)]
+        if self._queue is not None:
+            for _ in self._threads:
+                self._queue.put(None)
+            for t in self._threads:
+                t.join()
+            self._queue = None
+            self._threads = []
+        with self._lock:
+            results, self._results = self._results, []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()